@@ -0,0 +1,99 @@
+"""Modules imported and import time of each default.py action, measured with python -X importtime
+
+    python benchmarks/bench_import.py --repeat 5
+"""
+import sys
+import argparse
+import statistics
+import subprocess
+
+from environment import addon_path, benchmarks_path
+
+# Row name: default.py arguments, None only imports default.py without running an action
+actions: dict[str, list[str] | None] = {
+    "import only": None,
+    "build": [],
+    "clear_movies": ["clear_movies"],
+    "select_movies": ["select_movies"],
+    "configure_shows": ["configure_shows"],
+    "review_selections": ["review_selections"],
+    "select_smart": ["select_smart"],
+}
+
+marker = "-- action --"
+
+# Run in a fresh interpreter per action, -X importtime only reports a module the first time it is imported
+child_code = """
+import os
+import sys
+sys.path.insert(0, {benchmarks_path!r})
+from environment import setup
+from library import FakeLibrary
+setup(FakeLibrary(movies=50, shows=5, episodes_per_show=5))
+# Kodi's own modules are built in, only the add-on's imports are of interest
+import xbmc, xbmcaddon, xbmcgui, xbmcvfs
+sys.argv = ["default.py"] + {arguments!r}
+print({marker!r}, file=sys.stderr, flush=True)
+import default
+if {run_action!r}:
+    default.main()
+print("addon_data created:", os.path.exists(xbmcvfs.translatePath("special://profile/addon_data/")), file=sys.stderr)
+"""
+
+
+def measure_action(arguments: list[str] | None) -> tuple[float, list[str], bool]:
+    """Return the import time in ms after the action started, the add-on modules it imported and whether addon_data was created"""
+    code = child_code.format(
+        benchmarks_path=benchmarks_path, arguments=arguments or [], marker=marker, run_action=arguments is not None
+    )
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=addon_path,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    lines = completed.stderr.splitlines()
+    action_lines = lines[lines.index(marker) + 1:]
+
+    total_us = 0
+    addon_modules = []
+    created = False
+
+    for line in action_lines:
+        if line.startswith("import time:") and "|" in line:
+            self_us, _, name = (part.strip() for part in line[len("import time:"):].split("|"))
+            if self_us.isdigit():
+                total_us += int(self_us)
+                if name == "default" or name.startswith("resources"):
+                    addon_modules.append(name)
+        elif line.startswith("addon_data created:"):
+            created = line.endswith("True")
+
+    return total_us / 1000, addon_modules, created
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per action, the median time is reported")
+    parser.add_argument("--actions", nargs="+", choices=list(actions), help="measure only these actions")
+    parser.add_argument("--verbose", action="store_true", help="list the add-on modules each action imports")
+    args = parser.parse_args()
+
+    print(f"{'action':<20} {'import ms':>10} {'add-on modules':>15} {'addon_data at import':>21}")
+
+    for name in args.actions or actions:
+        runs = [measure_action(actions[name]) for _ in range(args.repeat)]
+        _, modules, created = runs[-1]
+        median_ms = statistics.median(run[0] for run in runs)
+
+        created_text = ("yes" if created else "no") if actions[name] is None else "-"
+        print(f"{name:<20} {median_ms:>10.1f} {len(modules):>15} {created_text:>21}")
+
+        if args.verbose:
+            print(f"    {', '.join(sorted(modules))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Build time, peak memory and log volume of a manual build on a large library, for each logging mode
+
+    python benchmarks/bench_logging.py --movies 40000 --shows 800
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from threading import Event
+
+from environment import setup
+from library import FakeLibrary
+
+# Mode name: (Kodi debug logging on, maximum logged collection items, 0 logs everything)
+logging_modes = {
+    "eager (full formatting, previous behaviour)": (True, 0),
+    "debug on, summarised": (True, 20),
+    "debug off": (False, 20),
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--movies", type=int, default=40000)
+    parser.add_argument("--shows", type=int, default=800)
+    parser.add_argument("--episodes", type=int, default=50)
+    args = parser.parse_args()
+
+    library = FakeLibrary(movies=args.movies, shows=args.shows, episodes_per_show=args.episodes)
+    setup(library)
+
+    import xbmc
+    import xbmcaddon
+    from resources.lib import logger
+    from resources.lib.config import config_file_path
+    from resources.lib.progress import ProgressReporter
+    from resources.lib.queries import list_all_movies
+    from resources.lib.playlist_functions import gather_media_info, playlist_builder
+
+    config = {
+        "movie": [{"id": movie["movieid"], "title": movie["title"]} for movie in library.movies],
+        "tvshow": [{"id": show["tvshowid"], "title": show["title"]} for show in library.tvshows],
+        "smart": [],
+    }
+    with open(config_file_path(), "w") as f:
+        json.dump(config, f)
+
+    xbmcaddon.settings["number_of_movies"] = str(args.movies // 4)
+
+    print(f"{args.movies} movies, {args.shows} shows x {args.episodes} episodes")
+
+    for mode, (debug_enabled, max_items) in logging_modes.items():
+        xbmc.conditions["System.GetBool(debug.showloginfo)"] = debug_enabled
+        logger._debug_state["checked"] = 0.0
+        logger._max_log_items[:] = [max_items]
+        xbmc.log_stats.update(messages=0, bytes=0)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+
+        list_all_movies(use_cache=False)
+        media_info = gather_media_info(monitor=xbmc.Monitor())
+        playlist_builder(
+            media_info=media_info,
+            monitor=xbmc.Monitor(),
+            progress=ProgressReporter(),
+            cancel_event=Event(),
+            chunk_size=500,
+        )
+
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        print(
+            f"{mode:45} {elapsed:7.2f}s  peak {peak / 2 ** 20:8.1f} MiB  "
+            f"logged {xbmc.log_stats['messages']} messages, {xbmc.log_stats['bytes'] / 2 ** 20:.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
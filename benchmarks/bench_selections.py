@@ -0,0 +1,84 @@
+"""Selection dialog helpers on synthetic libraries, indexed lookups against the previous list scans
+
+    python benchmarks/bench_selections.py --sizes 1000 10000 100000
+"""
+import argparse
+import time
+
+from environment import setup
+from library import FakeLibrary
+
+
+def legacy_preselection_idx(retrieved_info: list[dict], all_media_info: list[dict]) -> tuple[list[str], list[int]]:
+    """Previous media_titles_with_preselection_idx, one list.index() per preselected title"""
+    id_title_pairs = {media.get("movieid"): media.get("title") for media in all_media_info}
+    media_titles = sorted(id_title_pairs.values())
+    preselected_titles = [item.get("title") for item in retrieved_info]
+    return media_titles, [media_titles.index(title) for title in preselected_titles]
+
+
+def legacy_reconcile(retrieved_info: list[dict], all_media_info: list[dict], selected_titles: list[str]) -> list[dict]:
+    """Previous reconcile_titles, membership tests against lists"""
+    selected_ids_titles = [
+        {"id": item.get("movieid"), "title": item.get("title")}
+        for item in all_media_info
+        if item.get("title") in selected_titles
+    ]
+    existing_ids = [item.get("id") for item in retrieved_info]
+    new_ids = [item.get("id") for item in selected_ids_titles]
+    retained_items = [item for item in retrieved_info if item.get("id") in new_ids]
+    new_items = [item for item in selected_ids_titles if item.get("id") not in existing_ids]
+    return retained_items + new_items
+
+
+def timed(function, *args) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--preselected", type=float, default=0.25, help="share of the library already selected")
+    parser.add_argument("--legacy-limit", type=int, default=10000, help="largest library to run the previous code on")
+    args = parser.parse_args()
+
+    setup(FakeLibrary(movies=0, shows=0))
+
+    from resources.lib.queries import record_type
+    from resources.lib.selections import media_titles_with_preselection_idx, reconcile_selections, titles_by_id
+
+    movie_record = record_type("movie", ("title",))
+
+    print(f"{'items':>8} {'preselected':>12} {'legacy open':>12} {'legacy save':>12} {'open':>9} {'save':>9}")
+
+    for size in args.sizes:
+        all_media_info = FakeLibrary(movies=size, shows=0).movies
+        all_media_records = [movie_record(movie["movieid"], movie["title"]) for movie in all_media_info]
+        step = max(1, round(1 / args.preselected))
+        retrieved_info = [{"id": movie["movieid"], "title": movie["title"]} for movie in all_media_info[::step]]
+        # Reselect a different half of the library
+        selected = all_media_info[::2]
+
+        open_time, (titles, preselected_idx, media_ids) = timed(
+            media_titles_with_preselection_idx, retrieved_info, "movie", all_media_records
+        )
+        save_time, _ = timed(
+            lambda: reconcile_selections(
+                retrieved_info, [movie["movieid"] for movie in selected], titles_by_id(all_media_records)
+            )
+        )
+
+        if size <= args.legacy_limit:
+            legacy_open, _ = timed(legacy_preselection_idx, retrieved_info, all_media_info)
+            legacy_save, _ = timed(legacy_reconcile, retrieved_info, all_media_info, [movie["title"] for movie in selected])
+            legacy_text = f"{legacy_open:11.3f}s {legacy_save:11.3f}s"
+        else:
+            legacy_text = f"{'skipped':>12} {'skipped':>12}"
+
+        print(f"{size:>8} {len(retrieved_info):>12} {legacy_text} {open_time:8.3f}s {save_time:8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Put the Kodi stand-ins and the add-on on sys.path, must run before any add-on module is imported"""
+import os
+import sys
+
+benchmarks_path = os.path.dirname(os.path.abspath(__file__))
+stubs_path = os.path.join(benchmarks_path, "stubs")
+addon_path = os.path.join(os.path.dirname(benchmarks_path), "script.video.smartishplaylist")
+
+
+def setup(library) -> None:
+    """Install the stand-in modules and answer JSON-RPC from library"""
+    for path in (addon_path, stubs_path):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+    import xbmc
+
+    xbmc.backend = library
+
+
+def write_smart_playlist(path: str, name: str) -> None:
+    """Write a minimal .xsp file at a special:// path so the add-on can discover it"""
+    import xbmcvfs
+
+    xbmcvfs.mkdirs(path.rsplit("/", 1)[0] + "/")
+
+    with xbmcvfs.File(path, "w") as f:
+        f.write(
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes" ?>\n'
+            '<smartplaylist type="mixed">\n'
+            f"    <name>{name}</name>\n"
+            '    <match>all</match>\n'
+            '</smartplaylist>\n'
+        )
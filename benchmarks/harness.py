@@ -0,0 +1,83 @@
+"""Measure wall time, JSON-RPC traffic and peak memory of a callable, and compare runs against a saved baseline"""
+import json
+import time
+import tracemalloc
+from typing import Callable
+
+# Metric: smallest absolute increase treated as a regression, keeps timer noise on tiny values out of reports
+regression_floors: dict[str, float] = {
+    "wall_time": 0.01,
+    "rpc_calls": 1,
+    "bytes_received": 1024,
+    "peak_memory": 256 * 1024,
+}
+
+
+def measure(name: str, function: Callable[[], object], library) -> dict:
+    """Run function once and return its measurements"""
+    library.reset_stats()
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    function()
+
+    wall_time = time.perf_counter() - start
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"name": name, "wall_time": wall_time, "peak_memory": peak_memory, **library.stats()}
+
+
+def save_baseline(results: list[dict], path: str, parameters: dict) -> None:
+    """Write results and the parameters they were produced with to a JSON file"""
+    with open(path, "w") as f:
+        json.dump({"parameters": parameters, "results": results}, f, indent=2)
+
+
+def load_baseline(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def find_regressions(results: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    """Return a description of every metric that grew by more than tolerance (a fraction) over the baseline"""
+    regressions = []
+    baseline_results = {result["name"]: result for result in baseline.get("results", [])}
+
+    for result in results:
+        previous = baseline_results.get(result["name"])
+        if previous is None:
+            continue
+
+        for metric, floor in regression_floors.items():
+            before, after = previous.get(metric, 0), result.get(metric, 0)
+            if after - before > max(before * tolerance, floor):
+                regressions.append(f"{result['name']}: {metric} {format_metric(metric, before)} -> {format_metric(metric, after)}")
+
+    return regressions
+
+
+def format_metric(metric: str, value: float) -> str:
+    if metric == "wall_time":
+        return f"{value:.3f}s"
+    if metric in ("bytes_received", "bytes_sent", "peak_memory"):
+        return f"{value / 2 ** 20:.2f} MiB"
+    return str(value)
+
+
+def print_results(results: list[dict], baseline: dict | None = None) -> None:
+    """Print one row per result, with the baseline value alongside each metric if provided"""
+    baseline_results = {result["name"]: result for result in (baseline or {}).get("results", [])}
+    metrics = ("wall_time", "rpc_calls", "rpc_requests", "bytes_received", "peak_memory")
+
+    print(f"{'scenario':38}" + "".join(f"{metric:>24}" for metric in metrics))
+
+    for result in results:
+        previous = baseline_results.get(result["name"], {})
+        cells = []
+        for metric in metrics:
+            cell = format_metric(metric, result[metric])
+            if metric in previous:
+                cell = f"{format_metric(metric, previous[metric])} -> {cell}"
+            cells.append(f"{cell:>24}")
+        print(f"{result['name']:38}" + "".join(cells))
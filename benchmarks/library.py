@@ -0,0 +1,213 @@
+"""Synthetic Kodi video library answering the JSON-RPC methods the add-on uses"""
+import json
+import time
+import random
+import threading
+from collections import Counter
+
+
+class FakeLibrary:
+    """N movies, M shows with K episodes each, a share of movies linked to shows through 'showlink'"""
+
+    def __init__(
+        self,
+        movies: int = 1000,
+        shows: int = 100,
+        episodes_per_show: int = 50,
+        linked_movie_ratio: float = 0.1,
+        seed: int = 0,
+        latency: float = 0.0,
+        add_latency: float = 0.0,
+    ) -> None:
+        rng = random.Random(seed)
+
+        # Seconds added to every executeJSONRPC call, a batch counts as one call
+        self.latency = latency
+
+        # Seconds added per item in Playlist.Add, a slow device spends most of a build here
+        self.add_latency = add_latency
+
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+
+        self.tvshows: list[dict] = [
+            {"tvshowid": show_id, "title": f"Show {show_id:06d}", "label": f"Show {show_id:06d}"}
+            for show_id in range(1, shows + 1)
+        ]
+
+        self.episodes: dict[int, list[dict]] = {}
+        episode_id = 1
+        for show in self.tvshows:
+            show_episodes = []
+            for number in range(1, episodes_per_show + 1):
+                title = f"{show['title']} Episode {number:04d}"
+                show_episodes.append({"episodeid": episode_id, "title": title, "label": title})
+                episode_id += 1
+            self.episodes[show["tvshowid"]] = show_episodes
+            show["episode"] = episodes_per_show
+
+        self.movies: list[dict] = []
+        for movie_id in range(1, movies + 1):
+            title = f"Movie {movie_id:06d}"
+            showlink = [rng.choice(self.tvshows)["title"]] if self.tvshows and rng.random() < linked_movie_ratio else []
+            self.movies.append({"movieid": movie_id, "title": title, "label": title, "showlink": showlink})
+
+        self.episodes_by_id: dict[int, dict] = {
+            episode["episodeid"]: episode for show_episodes in self.episodes.values() for episode in show_episodes
+        }
+
+        # Smart playlist path: Files.GetDirectory items
+        self.smart_playlists: dict[str, list[dict]] = {}
+
+        # Playlist id: list of {"type": ..., "id": ...}
+        self.playlists: dict[int, list[dict]] = {}
+
+        self.rng = rng
+
+    def add_smart_playlist(self, path: str, movies: int = 0, episodes: int = 0, tvshows: int = 0) -> None:
+        """Register a smart playlist returning random samples of each media type
+
+        Only the JSON-RPC side is registered, see environment.write_smart_playlist() for the .xsp file.
+        """
+        all_episodes = [episode for show_episodes in self.episodes.values() for episode in show_episodes]
+
+        items = [
+            {"id": movie["movieid"], "type": "movie", "label": movie["label"]}
+            for movie in self.rng.sample(self.movies, min(movies, len(self.movies)))
+        ]
+        items += [
+            {"id": episode["episodeid"], "type": "episode", "label": episode["label"]}
+            for episode in self.rng.sample(all_episodes, min(episodes, len(all_episodes)))
+        ]
+        items += [
+            {"id": show["tvshowid"], "type": "tvshow", "label": show["label"]}
+            for show in self.rng.sample(self.tvshows, min(tvshows, len(self.tvshows)))
+        ]
+
+        self.smart_playlists[path] = items
+
+    def reset_stats(self) -> None:
+        """Zero the call, method and byte counters"""
+        self.calls = 0
+        self.methods: Counter = Counter()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def stats(self) -> dict:
+        """Return calls, requests per method and bytes in each direction since the last reset"""
+        with self.stats_lock:
+            return {
+                "rpc_calls": self.calls,
+                "rpc_requests": sum(self.methods.values()),
+                "bytes_sent": self.bytes_sent,
+                "bytes_received": self.bytes_received,
+                "methods": dict(self.methods),
+            }
+
+    def handle(self, request: str) -> str:
+        """Answer a single JSON-RPC request or a batch array"""
+        if self.latency:
+            time.sleep(self.latency)
+
+        data = json.loads(request)
+
+        if isinstance(data, list):
+            response = json.dumps([self.call(item) for item in data])
+        else:
+            response = json.dumps(self.call(data))
+
+        with self.stats_lock:
+            self.calls += 1
+            self.methods.update(item.get("method", "") for item in (data if isinstance(data, list) else [data]))
+            self.bytes_sent += len(request)
+            self.bytes_received += len(response)
+
+        return response
+
+    def call(self, request: dict) -> dict:
+        method: str = request.get("method", "")
+        params: dict = request.get("params", {})
+        handler = getattr(self, "rpc_" + method.replace(".", "_"), None)
+
+        if handler is None:
+            return {"id": request.get("id"), "jsonrpc": "2.0", "error": {"code": -32601, "message": "Method not found."}}
+
+        try:
+            return {"id": request.get("id"), "jsonrpc": "2.0", "result": handler(params)}
+        except KeyError:
+            return {"id": request.get("id"), "jsonrpc": "2.0", "error": {"code": -32602, "message": "Invalid params."}}
+
+    @staticmethod
+    def _project(item: dict, id_key: str, properties: list[str]) -> dict:
+        projected = {id_key: item[id_key], "label": item["label"]}
+        for name in properties:
+            projected[name] = item.get(name)
+        return projected
+
+    def _listing(self, items: list[dict], key: str, id_key: str, params: dict) -> dict:
+        properties: list[str] = params.get("properties", [])
+
+        if params.get("sort", {}).get("method") == "random":
+            items = self.rng.sample(items, len(items))
+
+        total = len(items)
+        limits = params.get("limits", {})
+        start = limits.get("start", 0)
+        end = limits.get("end", -1)
+        items = items[start:end if end >= 0 else None]
+
+        return {
+            key: [self._project(item, id_key, properties) for item in items],
+            "limits": {"start": start, "end": start + len(items), "total": total},
+        }
+
+    def rpc_VideoLibrary_GetMovies(self, params: dict) -> dict:
+        return self._listing(self.movies, "movies", "movieid", params)
+
+    def rpc_VideoLibrary_GetTVShows(self, params: dict) -> dict:
+        return self._listing(self.tvshows, "tvshows", "tvshowid", params)
+
+    def rpc_VideoLibrary_GetEpisodes(self, params: dict) -> dict:
+        return self._listing(self.episodes.get(params.get("tvshowid"), []), "episodes", "episodeid", params)
+
+    def rpc_VideoLibrary_GetEpisodeDetails(self, params: dict) -> dict:
+        episode = self.episodes_by_id[params.get("episodeid")]
+        return {"episodedetails": self._project(episode, "episodeid", params.get("properties", []))}
+
+    def rpc_Files_GetDirectory(self, params: dict) -> dict:
+        properties: list[str] = params.get("properties", [])
+        files = [
+            dict(item, **{name: self.tvshows[item["id"] - 1].get(name) for name in properties})
+            if item["type"] == "tvshow" else item
+            for item in self.smart_playlists.get(params.get("directory"), [])
+        ]
+        return {"files": files, "limits": {"start": 0, "end": len(files), "total": len(files)}}
+
+    def rpc_Playlist_Clear(self, params: dict) -> str:
+        self.playlists[params.get("playlistid")] = []
+        return "OK"
+
+    def rpc_Playlist_Add(self, params: dict) -> str:
+        playlist = self.playlists.setdefault(params.get("playlistid"), [])
+        return self.rpc_Playlist_Insert(dict(params, position=len(playlist)))
+
+    def rpc_Playlist_Insert(self, params: dict) -> str:
+        items = params.get("item")
+        items = items if isinstance(items, list) else [items]
+        if self.add_latency:
+            time.sleep(self.add_latency * len(items))
+        playlist = self.playlists.setdefault(params.get("playlistid"), [])
+        position = params["position"]
+        playlist[position:position] = [{"type": key[:-2], "id": value} for item in items for key, value in item.items()]
+        return "OK"
+
+    def rpc_Playlist_Remove(self, params: dict) -> str:
+        del self.playlists.get(params.get("playlistid"), [])[params["position"]]
+        return "OK"
+
+    def rpc_Playlist_GetItems(self, params: dict) -> dict:
+        items = [dict(item, label="") for item in self.playlists.get(params.get("playlistid"), [])]
+        return {"items": items, "limits": {"start": 0, "end": len(items), "total": len(items)}}
+
+    def rpc_Player_GetActivePlayers(self, params: dict) -> list:
+        return []
@@ -0,0 +1,199 @@
+"""Benchmark suite for the add-on against a simulated Kodi JSON-RPC backend
+
+    python benchmarks/run.py --movies 5000 --shows 300 --latency 0.002 --save baseline.json
+    python benchmarks/run.py --movies 5000 --shows 300 --latency 0.002 --compare baseline.json
+"""
+import sys
+import json
+import argparse
+import threading
+from collections import Counter
+
+from environment import setup, write_smart_playlist
+from harness import measure, print_results, save_baseline, load_baseline, find_regressions
+from library import FakeLibrary
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--movies", type=int, default=5000)
+    parser.add_argument("--shows", type=int, default=300)
+    parser.add_argument("--episodes", type=int, default=40, help="episodes per show")
+    parser.add_argument("--smart", type=int, default=10, help="number of smart playlists")
+    parser.add_argument("--latency", type=float, default=0.002, help="seconds added to every JSON-RPC call")
+    parser.add_argument("--add-latency", type=float, default=0.0001, help="seconds per item added to a playlist")
+    parser.add_argument("--workers", type=int, default=4, help="'worker_threads' setting")
+    parser.add_argument("--warm", action="store_true", help="keep library snapshots between scenarios")
+    parser.add_argument("--scenarios", nargs="+", help="run only these scenarios")
+    parser.add_argument("--save", help="write results to this baseline file")
+    parser.add_argument("--compare", help="compare results with this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed growth over the baseline, as a fraction")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_arguments()
+    parameters = {key: value for key, value in vars(args).items() if key not in ("save", "compare", "scenarios", "tolerance")}
+
+    library = FakeLibrary(
+        movies=args.movies,
+        shows=args.shows,
+        episodes_per_show=args.episodes,
+        latency=args.latency,
+        add_latency=args.add_latency,
+    )
+    setup(library)
+
+    import xbmc
+    import xbmcaddon
+    from resources.lib.cache import bump_library_revision
+    from resources.lib.config import config_file_path
+    from resources.lib.media import MediaItems
+    from resources.lib.progress import ProgressReporter
+    from resources.lib.queries import list_all_movies
+    from resources.lib.playlist_functions import (
+        gather_media_info,
+        gather_all_smart_playlist_info,
+        deduplicate_media,
+        define_chunks,
+        playlist_builder,
+        AdaptiveChunkSize,
+    )
+    from resources.lib.selections import (
+        media_titles_with_preselection_idx,
+        reconcile_selections,
+        titles_by_id,
+        list_smart_playlists,
+        review_manual_tv_show_selections,
+        review_smart_playlist_selections,
+    )
+
+    xbmcaddon.settings["worker_threads"] = str(args.workers)
+
+    smart_playlists = []
+    for number in range(args.smart):
+        path = f"special://profile/playlists/video/benchmark_{number:03d}.xsp"
+        library.add_smart_playlist(path, movies=50, episodes=200, tvshows=5)
+        write_smart_playlist(path, f"Benchmark {number:03d}")
+        smart_playlists.append({"title": f"Benchmark {number:03d}", "path": path})
+
+    config = {
+        "movie": [{"id": movie["movieid"], "title": movie["title"]} for movie in library.movies[::4]],
+        "tvshow": [{"id": show["tvshowid"], "title": show["title"]} for show in library.tvshows],
+        "smart": smart_playlists,
+    }
+    with open(config_file_path(), "w") as f:
+        json.dump(config, f)
+
+    monitor = xbmc.Monitor()
+    media_info = gather_media_info(monitor=monitor)
+    smart_media_info = gather_all_smart_playlist_info(monitor=monitor)
+
+    # A rebuild replacing a few movies of the playlist last built from media_info
+    replacement_movies = [{"id": movie["movieid"], "title": movie["title"]} for movie in library.movies[1::4][:5]]
+    changed_media_info = {
+        "movie": MediaItems.concat([media_info["movie"][5:], MediaItems.from_items(replacement_movies)]),
+        "episode": media_info["episode"],
+    }
+
+    scenarios = {
+        "gather_media_info": lambda: gather_media_info(monitor=monitor, cancel_event=threading.Event()),
+        "gather_all_smart_playlist_info": lambda: gather_all_smart_playlist_info(
+            monitor=monitor, cancel_event=threading.Event()
+        ),
+        "deduplicate_media": lambda: deduplicate_media(smart_media_info),
+        "define_chunks": lambda: define_chunks(
+            media_info=media_info, chunk_by_size=True, number_of_chunks=10, chunk_size=25
+        ),
+        "playlist_builder": lambda: playlist_builder(
+            media_info=media_info,
+            monitor=monitor,
+            progress=ProgressReporter(),
+            cancel_event=threading.Event(),
+        ),
+        "playlist_builder (adaptive)": lambda: playlist_builder(
+            media_info=media_info,
+            monitor=monitor,
+            progress=ProgressReporter(),
+            cancel_event=threading.Event(),
+            chunk_sizer=AdaptiveChunkSize(target_seconds=0.25),
+        ),
+        "playlist_builder (incremental)": lambda: playlist_builder(
+            media_info=changed_media_info,
+            monitor=monitor,
+            progress=ProgressReporter(),
+            cancel_event=threading.Event(),
+            incremental=True,
+        ),
+        "select_media (open)": lambda: media_titles_with_preselection_idx(
+            config["movie"], "movie", list_all_movies()
+        ),
+        "select_media (save)": lambda: reconcile_selections(
+            config["movie"],
+            [movie["movieid"] for movie in library.movies[::2]],
+            titles_by_id(list_all_movies()),
+        ),
+        "list_smart_playlists": list_smart_playlists,
+        "review_manual_tv_show_selections": lambda: review_manual_tv_show_selections(config["tvshow"], 5),
+        "review_smart_playlist_selections": review_smart_playlist_selections,
+    }
+
+    # Scenario: media the playlist must hold afterwards, a build that times well but drops or repeats items is a failure
+    expected_playlists = {
+        "playlist_builder": media_info,
+        "playlist_builder (adaptive)": media_info,
+        "playlist_builder (incremental)": changed_media_info,
+    }
+
+    results = []
+    mismatches = []
+    for name, scenario in scenarios.items():
+        if args.scenarios and name not in args.scenarios:
+            continue
+
+        if not args.warm:
+            bump_library_revision()
+
+        results.append(measure(name, scenario, library))
+
+        if name in expected_playlists:
+            expected = Counter(
+                (media_type, item_id) for media_type, items in expected_playlists[name].items() for item_id in items
+            )
+            built = Counter((item["type"], item["id"]) for item in library.playlists.get(1, []))
+            if built != expected:
+                mismatches.append(
+                    f"{name}: playlist has {sum(built.values())} items, {sum((expected - built).values())} missing, "
+                    f"{sum((built - expected).values())} unexpected"
+                )
+
+    baseline = load_baseline(args.compare) if args.compare else None
+
+    print(
+        f"{args.movies} movies, {args.shows} shows x {args.episodes} episodes, {args.smart} smart playlists, "
+        f"{args.latency * 1000:.1f}ms per call, {args.workers} workers{' (warm)' if args.warm else ''}"
+    )
+    print_results(results, baseline)
+
+    if args.save:
+        save_baseline(results, args.save, parameters)
+        print(f"Saved baseline to {args.save}")
+
+    for mismatch in mismatches:
+        print(f"MISMATCH {mismatch}")
+
+    if baseline:
+        if baseline.get("parameters") != parameters:
+            print(f"Warning: baseline parameters differ: {baseline.get('parameters')}")
+
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+
+        return 1 if regressions or mismatches else 0
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""In-process stand-in for Kodi's xbmc module, JSON-RPC is answered by the installed benchmark backend"""
+import time
+
+LOGDEBUG = 0
+LOGINFO = 1
+LOGWARNING = 2
+LOGERROR = 3
+LOGFATAL = 4
+LOGNONE = 5
+
+PLAYLIST_MUSIC = 0
+PLAYLIST_VIDEO = 1
+
+# Set by benchmarks.environment.setup(), must provide handle(request: str) -> str
+backend = None
+
+# Condition name: value returned by getCondVisibility
+conditions: dict[str, bool] = {"System.GetBool(debug.showloginfo)": False}
+
+# Info label name: value returned by getInfoLabel
+info_labels: dict[str, str] = {}
+
+log_stats: dict[str, int] = {"messages": 0, "bytes": 0}
+
+
+def log(msg: str, level: int = LOGDEBUG) -> None:
+    log_stats["messages"] += 1
+    log_stats["bytes"] += len(msg)
+
+
+def executeJSONRPC(jsonrpccommand: str) -> str:
+    return backend.handle(jsonrpccommand)
+
+
+def getCondVisibility(condition: str) -> bool:
+    return conditions.get(condition, False)
+
+
+def getInfoLabel(cLine: str) -> str:
+    return info_labels.get(cLine, "")
+
+
+def getGlobalIdleTime() -> int:
+    return 0
+
+
+def executebuiltin(function: str, wait: bool = False) -> None:
+    pass
+
+
+def sleep(timemillis: int) -> None:
+    time.sleep(timemillis / 1000)
+
+
+class Monitor:
+    def abortRequested(self) -> bool:
+        return False
+
+    def waitForAbort(self, timeout: float | None = None) -> bool:
+        if timeout:
+            time.sleep(timeout)
+        return False
+
+    def onNotification(self, sender: str, method: str, data: str) -> None:
+        pass
+
+
+class PlayList:
+    def __init__(self, playList: int) -> None:
+        self.playlist_id = playList
+
+    def shuffle(self) -> None:
+        pass
+
+    def unshuffle(self) -> None:
+        pass
+
+    def size(self) -> int:
+        return len(backend.playlists.get(self.playlist_id, [])) if backend else 0
+
+
+class Player:
+    def play(self, item=None, listitem=None, windowed: bool = False, startpos: int = -1) -> None:
+        pass
+
+    def isPlaying(self) -> bool:
+        return False
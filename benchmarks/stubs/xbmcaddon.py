@@ -0,0 +1,33 @@
+"""In-process stand-in for Kodi's xbmcaddon module, settings default to the add-on's settings.xml"""
+import os
+import xml.etree.ElementTree as ET
+
+_settings_xml = os.path.join(
+    os.path.dirname(__file__), "..", "..", "script.video.smartishplaylist", "resources", "settings.xml"
+)
+
+# Setting id: string value, edit directly to change what the add-on reads
+settings: dict[str, str] = {
+    setting.get("id"): (setting.findtext("default") or "")
+    for setting in ET.parse(_settings_xml).iter("setting")
+}
+
+
+class Addon:
+    def __init__(self, id: str | None = None) -> None:
+        self.id = id or "script.video.smartishplaylist"
+
+    def getSetting(self, id: str) -> str:
+        return settings.get(id, "")
+
+    def getSettingBool(self, id: str) -> bool:
+        return settings.get(id, "false") == "true"
+
+    def getSettingInt(self, id: str) -> int:
+        return int(settings.get(id) or 0)
+
+    def setSetting(self, id: str, value: str) -> None:
+        settings[id] = value
+
+    def getAddonInfo(self, id: str) -> str:
+        return {"id": self.id, "name": "Smart-Ish Playlist", "version": "benchmark"}.get(id, "")
@@ -0,0 +1,58 @@
+"""In-process stand-in for Kodi's xbmcgui module, dialogs return immediately as if confirmed"""
+
+NOTIFICATION_INFO = "info"
+NOTIFICATION_WARNING = "warning"
+NOTIFICATION_ERROR = "error"
+
+INPUT_ALPHANUM = 0
+INPUT_NUMERIC = 1
+
+
+class Dialog:
+    def multiselect(self, heading: str, options: list, autoclose: int = 0, preselect: list | None = None, useDetails: bool = False):
+        return preselect or None
+
+    def select(self, heading: str, list: list, autoclose: int = 0, preselect: int = -1, useDetails: bool = False) -> int:
+        return -1
+
+    def yesno(self, heading: str, message: str, *args, **kwargs) -> bool:
+        return True
+
+    def input(self, heading: str, defaultt: str = "", type: int = INPUT_ALPHANUM, option: int = 0, autoclose: int = 0) -> str:
+        return ""
+
+    def textviewer(self, heading: str, text: str, usemono: bool = False) -> None:
+        pass
+
+    def notification(self, heading: str, message: str, icon: str = NOTIFICATION_INFO, time: int = 5000, sound: bool = True) -> None:
+        pass
+
+
+class DialogProgress:
+    def create(self, heading: str, message: str = "") -> None:
+        pass
+
+    def update(self, percent: int, message: str = "") -> None:
+        pass
+
+    def iscanceled(self) -> bool:
+        return False
+
+    def close(self) -> None:
+        pass
+
+
+class Window:
+    _properties: dict[int, dict[str, str]] = {}
+
+    def __init__(self, existingWindowId: int = -1) -> None:
+        self.window_id = existingWindowId
+
+    def getProperty(self, key: str) -> str:
+        return self._properties.get(self.window_id, {}).get(key, "")
+
+    def setProperty(self, key: str, value: str) -> None:
+        self._properties.setdefault(self.window_id, {})[key] = value
+
+    def clearProperty(self, key: str) -> None:
+        self._properties.get(self.window_id, {}).pop(key, None)
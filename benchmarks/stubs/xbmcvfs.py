@@ -0,0 +1,79 @@
+"""In-process stand-in for Kodi's xbmcvfs module, special:// paths map to a throwaway directory"""
+import os
+import tempfile
+
+root = tempfile.mkdtemp(prefix="smartish_bench_")
+
+
+def translatePath(path: str) -> str:
+    if path.startswith("special://"):
+        return os.path.join(root, path[len("special://"):])
+    return path
+
+
+def exists(path: str) -> bool:
+    return os.path.exists(translatePath(path))
+
+
+def mkdirs(path: str) -> bool:
+    os.makedirs(translatePath(path), exist_ok=True)
+    return True
+
+
+def delete(file: str) -> bool:
+    try:
+        os.remove(translatePath(file))
+        return True
+    except OSError:
+        return False
+
+
+def rename(file: str, newFile: str) -> bool:
+    os.replace(translatePath(file), translatePath(newFile))
+    return True
+
+
+def listdir(path: str) -> tuple[list[str], list[str]]:
+    path = translatePath(path)
+    entries = os.listdir(path) if os.path.isdir(path) else []
+    dirs = [entry for entry in entries if os.path.isdir(os.path.join(path, entry))]
+    files = [entry for entry in entries if not os.path.isdir(os.path.join(path, entry))]
+    return dirs, files
+
+
+class Stat:
+    def __init__(self, path: str) -> None:
+        self._stat = os.stat(translatePath(path))
+
+    def st_mtime(self) -> int:
+        return int(self._stat.st_mtime)
+
+    def st_size(self) -> int:
+        return self._stat.st_size
+
+
+class File:
+    def __init__(self, filepath: str, mode: str | None = None) -> None:
+        self._file = open(translatePath(filepath), "wb" if mode == "w" else "rb")
+
+    def __enter__(self) -> "File":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def read(self, numBytes: int = -1) -> str:
+        return self._file.read(numBytes if numBytes > 0 else -1).decode("utf-8")
+
+    def readBytes(self, numBytes: int = -1) -> bytearray:
+        return bytearray(self._file.read(numBytes if numBytes > 0 else -1))
+
+    def write(self, buffer: str | bytes | bytearray) -> bool:
+        self._file.write(buffer.encode("utf-8") if isinstance(buffer, str) else buffer)
+        return True
+
+    def size(self) -> int:
+        return os.fstat(self._file.fileno()).st_size
+
+    def close(self) -> None:
+        self._file.close()
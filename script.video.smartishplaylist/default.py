@@ -2,33 +2,34 @@ import sys
 import json
 import threading
 import xbmc
-from queue import Queue
 import xbmcaddon
 import xbmcgui
+from typing import TYPE_CHECKING
 
 from resources.lib.logger import write_log
-from resources.lib.selections import (
-    select_media,
-    configure_shows,
-    review_selections,
-    select_smart_playlists,
-    review_smart_playlist_selections
-)
-from resources.lib.playlist_functions import (
-    gather_media_info,
-    gather_all_smart_playlist_info,
-    quit_kodi_after,
-    playlist_builder,
-    video_playlist_start,
-)
-from resources.lib.config import clear_config_section
+
+if TYPE_CHECKING:
+    from resources.lib.progress import ProgressReporter
+
+# Add-on modules are imported by the action that needs them, so a quick action such as clearing selections
+# does not pay for loading the build pipeline or the selection dialogs
 
 all_args = sys.argv
 
 write_log(f"all args: {all_args}")
 
 
-def rpc_worker(progress_queue: Queue, cancel_event: threading.Event) -> None:
+def rpc_worker(progress: "ProgressReporter", cancel_event: threading.Event) -> None:
+    from resources.lib.playlist_functions import (
+        playlist_gatherers,
+        gather_into_queue,
+        deduplicate_media,
+        playlist_builder,
+        playlist_builder_streaming,
+        AdaptiveChunkSize,
+    )
+    from resources.lib import metrics
+
     write_log("Begin RPC worker")
     addon = xbmcaddon.Addon()
 
@@ -41,27 +42,81 @@ def rpc_worker(progress_queue: Queue, cancel_event: threading.Event) -> None:
 
     chunk_size = int(addon.getSetting("batch_size"))
     number_of_chunks = int(addon.getSetting("number_of_batches"))
+    remove_duplicates = addon.getSettingBool("remove_duplicates")
+
+    chunk_sizer = None
+    if chunk_type == 2:
+        chunk_sizer = AdaptiveChunkSize(target_seconds=int(addon.getSetting("batch_target_ms")) / 1000, initial=chunk_size)
 
 
     monitor = xbmc.Monitor()
-    if playlist_type == 0:
-        items = gather_media_info(monitor=monitor)
-    elif playlist_type == 1:
-        items = gather_all_smart_playlist_info(monitor=monitor)
+    if playlist_type in playlist_gatherers:
+        gather = playlist_gatherers[playlist_type]
     else:
         write_log(f"Playlist type undefined: {playlist_type}")
         return None
 
-    playlist_progress = playlist_builder(
-        media_info=items,
-        monitor=monitor,
-        progress_queue=progress_queue,
-        cancel_event=cancel_event,
-        chunk_by_size=chunk_by_size,
-        chunk_size=chunk_size,
-        number_of_chunks=number_of_chunks,
+    precomputed = None
 
-    )
+    if addon.getSettingBool("precompute_selection"):
+        from resources.lib.precompute import take_precomputed_selection
+
+        precomputed = take_precomputed_selection()
+
+    if precomputed is not None:
+        write_log("Building from the precomputed selection")
+
+        playlist_progress = playlist_builder(
+            media_info=precomputed,
+            monitor=monitor,
+            progress=progress,
+            cancel_event=cancel_event,
+            chunk_by_size=chunk_by_size,
+            chunk_size=chunk_size,
+            number_of_chunks=number_of_chunks,
+            chunk_sizer=chunk_sizer,
+            incremental=addon.getSettingBool("incremental_update"),
+        )
+
+    elif addon.getSettingBool("pipelined_build"):
+        from queue import Queue
+
+        media_queue = Queue()
+
+        producer = threading.Thread(
+            target=gather_into_queue, args=(gather, media_queue, monitor, cancel_event), daemon=True
+        )
+        producer.start()
+
+        playlist_progress = playlist_builder_streaming(
+            media_queue=media_queue,
+            monitor=monitor,
+            progress=progress,
+            cancel_event=cancel_event,
+            chunk_size=chunk_size,
+            deduplicate=remove_duplicates,
+            chunk_sizer=chunk_sizer,
+        )
+
+    else:
+        with metrics.span("gather"):
+            items = gather(monitor=monitor, cancel_event=cancel_event)
+
+        if remove_duplicates:
+            with metrics.span("dedup"):
+                items, _ = deduplicate_media(items)
+
+        playlist_progress = playlist_builder(
+            media_info=items,
+            monitor=monitor,
+            progress=progress,
+            cancel_event=cancel_event,
+            chunk_by_size=chunk_by_size,
+            chunk_size=chunk_size,
+            number_of_chunks=number_of_chunks,
+            chunk_sizer=chunk_sizer,
+            incremental=addon.getSettingBool("incremental_update"),
+        )
 
     if playlist_progress:
         write_log("Playlist build complete")
@@ -73,26 +128,41 @@ def rpc_worker(progress_queue: Queue, cancel_event: threading.Event) -> None:
 
 
 def run() -> None:
+    from resources.lib.playlist_functions import quit_kodi_after, video_playlist_start
+    from resources.lib.progress import ProgressReporter
+    from resources.lib import metrics
+
     addon = xbmcaddon.Addon()
     progress = xbmcgui.DialogProgress()
 
     autoplay = addon.getSettingBool("auto_play")
     shuffle = addon.getSettingBool("shuffle")
     auto_quit = addon.getSettingBool("auto_quit")
+    early_start = autoplay and addon.getSettingBool("pipelined_build") and addon.getSettingBool("early_start")
 
     write_log(f"Building, Autoplay: {autoplay} Shuffle: {shuffle}")
 
+    metrics.reset()
+
     progress.create("Building Playlist", "Initializing...")
 
-    progress_queue = Queue()
+    progress_reporter = ProgressReporter()
     cancel_event = threading.Event()
 
-    background_worker = threading.Thread(
-        target=rpc_worker, args=(progress_queue, cancel_event), daemon=True
-    )
+    def build() -> None:
+        try:
+            with metrics.span("build"):
+                rpc_worker(progress_reporter, cancel_event)
+        finally:
+            # Release the dialog even if the build stopped without finishing, has no effect after a completed build
+            progress_reporter.finish(completed=False)
+
+    background_worker = threading.Thread(target=build, daemon=True)
 
     background_worker.start()
     cancelled = False
+    playback_started = False
+    shown_version = 0
 
     while True:
         if progress.iscanceled():
@@ -100,20 +170,20 @@ def run() -> None:
             cancelled = True
             break
 
-        try:
-            message = progress_queue.get_nowait()
+        state = progress_reporter.wait(0.1)
 
-            if message:
-                if message[0] == "done":
-                    break
+        if state.first_chunk and early_start and not playback_started:
+            with metrics.span("start playback"):
+                video_playlist_start(shuffle=shuffle)
+            playback_started = True
+            write_log("Playback started after first chunk")
 
-                percent, text = message
-                progress.update(percent, text)
-
-        except Exception as e:
-            write_log(f"Error: {e}")
+        if state.finished:
+            break
 
-        xbmc.sleep(50)
+        if state.version != shown_version and state.text:
+            progress.update(state.percent, state.text)
+            shown_version = state.version
 
     progress.close()
 
@@ -123,17 +193,29 @@ def run() -> None:
         )
         write_log("Playlist build cancelled")
 
+    elif not state.completed:
+        xbmcgui.Dialog().notification(
+            "Stopped", "Playlist build interrupted", xbmcgui.NOTIFICATION_ERROR, 3000
+        )
+
     else:
         xbmcgui.Dialog().notification(
             "Playlist Ready", "Build complete", xbmcgui.NOTIFICATION_INFO, 3000
         )
-        if autoplay:
-            video_playlist_start(shuffle=shuffle)
+        if autoplay and not playback_started:
+            with metrics.span("start playback"):
+                video_playlist_start(shuffle=shuffle)
             write_log("Playback started")
 
-            if auto_quit:
-                auto_quit_minutes = json.loads(addon.getSetting("auto_quit_minutes"))
-                quit_kodi_after(auto_quit_minutes)
+    report = metrics.write_report()
+    write_log(f"Build report written to {metrics.report_file_path()}")
+
+    if addon.getSettingBool("show_build_report"):
+        xbmcgui.Dialog().textviewer("Build Report", report)
+
+    if autoplay and auto_quit and not cancelled and state.completed:
+        auto_quit_minutes = json.loads(addon.getSetting("auto_quit_minutes"))
+        quit_kodi_after(auto_quit_minutes)
 
 
 def main():
@@ -141,18 +223,23 @@ def main():
         action = all_args[1]
 
         if action == "select_shows":
+            from resources.lib.selections import select_media
             select_media(media_type="tvshow")
 
         if action == "select_movies":
+            from resources.lib.selections import select_media
             select_media(media_type="movie")
 
         if action == "configure_shows":
+            from resources.lib.selections import configure_shows
             configure_shows()
 
         if action == "clear_movies":
+            from resources.lib.config import clear_config_section
             clear_config_section("movie")
 
         if action == "clear_tvshows":
+            from resources.lib.config import clear_config_section
             clear_config_section("tvshow")
 
         if action == "review_selections":
@@ -160,14 +247,17 @@ def main():
             playlist_type = int(addon.getSetting("playlist_type"))
 
             if playlist_type == 0:
+                from resources.lib.selections import review_selections
                 review_selections()
             elif playlist_type == 1:
+                from resources.lib.selections import review_smart_playlist_selections
                 review_smart_playlist_selections()
             else:
                 write_log(f"Playlist type undefined: {playlist_type}")
 
 
         if action == "select_smart":
+            from resources.lib.selections import select_smart_playlists
             select_smart_playlists()
 
     else:
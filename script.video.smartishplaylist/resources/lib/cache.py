@@ -0,0 +1,266 @@
+import os
+import json
+import hashlib
+import xbmcvfs
+import threading
+from functools import cache
+from typing import Any, Callable, Literal, NamedTuple
+
+from resources.lib.config import addon_data_path
+from resources.lib.logger import write_log
+
+# "library" advances when items are added or removed and guards the movie, show and episode id snapshots.
+# "content" also advances when items are updated (playcounts, edits) and guards smart playlist results.
+RevisionKind = Literal["library", "content"]
+
+# name: (stamp the data was built against, data), lives for the current interpreter only
+_memory_cache: dict[str, tuple[int | str, Any]] = {}
+
+# Serialises snapshot writes from worker threads
+_write_lock = threading.RLock()
+
+# name: lock held while that snapshot is rebuilt, so concurrent callers wait for one load instead of repeating it
+_load_locks: dict[str, threading.Lock] = {}
+
+
+@cache
+def cache_path() -> str:
+    """Return the snapshot folder, created on first use"""
+    path = os.path.join(addon_data_path(), "cache")
+
+    if not xbmcvfs.exists(path):
+        xbmcvfs.mkdirs(path)
+
+    return path
+
+
+def revision_file_path() -> str:
+    """Return the location of the library revision counters"""
+    return os.path.join(cache_path(), "library_revision.json")
+
+
+class Uncached(NamedTuple):
+    """Loader result handed to the caller but not stored, e.g. the fallback for a failed request so it is retried next time"""
+    data: Any
+
+
+def library_revisions() -> dict[str, int]:
+    """Return every library revision counter, advanced by the service whenever the library changes"""
+    if not xbmcvfs.exists(revision_file_path()):
+        return {}
+
+    try:
+        with xbmcvfs.File(revision_file_path()) as f:
+            revisions: dict[str, int] = json.loads(f.read())
+    except ValueError:
+        write_log("Unreadable library revision file, assuming revision 0")
+        revisions = {}
+
+    return revisions
+
+
+def library_revision(kind: RevisionKind = "library") -> int:
+    """Return the current revision of the given kind"""
+    return library_revisions().get(kind, 0)
+
+
+def bump_library_revision(kinds: tuple[RevisionKind, ...] = ("library", "content")) -> dict[str, int]:
+    """Advance the given revisions, invalidating everything built against an older one"""
+    revisions = library_revisions()
+
+    for kind in kinds:
+        revisions[kind] = revisions.get(kind, 0) + 1
+
+    with xbmcvfs.File(revision_file_path(), "w") as f:
+        f.write(json.dumps(revisions))
+
+    write_log(f"Library revisions advanced to {revisions}")
+
+    return revisions
+
+
+def file_hash(path: str) -> str:
+    """Return a digest of a file's content, for keying caches on files that may be edited in place"""
+    with xbmcvfs.File(path) as f:
+        content: str = f.read()
+
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def snapshot_file_path(name: str) -> str:
+    """Return the on-disk location of a named snapshot"""
+    return os.path.join(cache_path(), f"{name}.json")
+
+
+def read_snapshot(name: str, stamp: int | str, decode: Callable[[Any], Any] | None = None) -> Any | None:
+    """Return a snapshot's data if it was built against the given stamp (a revision or cache key), otherwise None
+
+    decode converts data read back from disk into the form the loader returned, e.g. rows back into records.
+    """
+    cached = _memory_cache.get(name)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    file_path = snapshot_file_path(name)
+    if not xbmcvfs.exists(file_path):
+        return None
+
+    try:
+        with xbmcvfs.File(file_path) as f:
+            snapshot: dict = json.loads(f.read())
+    except ValueError:
+        write_log(f"Discarding unreadable snapshot {name}")
+        return None
+
+    if snapshot.get("revision") != stamp:
+        write_log(f"Snapshot {name} is stale: {snapshot.get('revision')} != {stamp}")
+        return None
+
+    data = snapshot.get("data")
+    if decode is not None:
+        data = decode(data)
+    _memory_cache[name] = (stamp, data)
+
+    return data
+
+
+def stored_snapshot_stamp(name: str) -> int | str | None:
+    """Return the stamp of the snapshot file on disk, bypassing the memory cache
+
+    For snapshots another process may consume or replace, where this process's memory copy can outlive the file.
+    """
+    file_path = snapshot_file_path(name)
+    if not xbmcvfs.exists(file_path):
+        return None
+
+    try:
+        with xbmcvfs.File(file_path) as f:
+            snapshot: dict = json.loads(f.read())
+    except ValueError:
+        write_log(f"Unreadable snapshot {name}")
+        return None
+
+    return snapshot.get("revision")
+
+
+def write_snapshot(name: str, stamp: int | str, data: Any) -> None:
+    """Store a snapshot in memory and on disk, stamped with the revision or cache key it was built against"""
+    with _write_lock:
+        _memory_cache[name] = (stamp, data)
+
+        with xbmcvfs.File(snapshot_file_path(name), "w") as f:
+            f.write(json.dumps({"revision": stamp, "data": data}))
+
+
+def discard_snapshot(name: str) -> None:
+    """Remove a snapshot from memory and disk"""
+    with _write_lock:
+        _memory_cache.pop(name, None)
+
+        file_path = snapshot_file_path(name)
+        if xbmcvfs.exists(file_path):
+            xbmcvfs.delete(file_path)
+
+
+def cached_snapshot(name: str, loader: Callable[[], Any], decode: Callable[[Any], Any] | None = None) -> Any:
+    """Return a named snapshot, calling loader to rebuild it only when the library has changed
+
+    A loader returning Uncached(data) has data returned without storing it, so the next call loads again.
+    """
+    revision = library_revision()
+
+    data = read_snapshot(name, revision, decode)
+
+    if data is None:
+        with _write_lock:
+            load_lock = _load_locks.setdefault(name, threading.Lock())
+
+        with load_lock:
+            # Another thread may have built it while this one waited
+            data = read_snapshot(name, revision, decode)
+
+            if data is None:
+                write_log(f"Building snapshot {name} for library revision {revision}")
+                data = loader()
+
+                if isinstance(data, Uncached):
+                    write_log(f"Not storing snapshot {name}, loading failed")
+                    return data.data
+
+                write_snapshot(name, revision, data)
+
+    return data
+
+
+def cached_mapping(name: str, keys: list[str], loader: Callable[[list[str]], dict[str, Any]]) -> dict[str, Any]:
+    """Return the named snapshot's values for keys, calling loader only for keys not yet stored for this revision"""
+    revision = library_revision()
+
+    mapping: dict[str, Any] = read_snapshot(name, revision) or {}
+    missing: list[str] = [key for key in dict.fromkeys(keys) if key not in mapping]
+
+    if missing:
+        write_log(f"Adding {len(missing)} entries to snapshot {name} for library revision {revision}")
+        loaded = loader(missing)
+
+        # Merge with whatever other threads stored while the loader ran
+        with _write_lock:
+            mapping = {**(read_snapshot(name, revision) or {}), **loaded}
+            write_snapshot(name, revision, mapping)
+
+    return {key: mapping[key] for key in keys if key in mapping}
+
+
+def file_result_key(name: str, path: str) -> tuple[str, str]:
+    """Return the snapshot name and cache key of a result derived from a file"""
+    key = f"{file_hash(path)}:{library_revision('content')}"
+    snapshot_name = f"{name}_{hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]}"
+
+    return snapshot_name, key
+
+
+def stored_file_result(name: str, path: str) -> Any | None:
+    """Return a still valid result previously derived from a file without computing it, otherwise None"""
+    return read_snapshot(*file_result_key(name, path))
+
+
+def cached_file_result(name: str, path: str, loader: Callable[[], Any]) -> Any:
+    """Return a result derived from a file, calling loader only when the file's content or the library content has changed
+
+    As with cached_snapshot, a loader returning Uncached(data) has data returned without storing it.
+    """
+    snapshot_name, key = file_result_key(name, path)
+
+    data = read_snapshot(snapshot_name, key)
+
+    if data is None:
+        write_log(f"Building {name} result for {path}")
+        data = loader()
+
+        if isinstance(data, Uncached):
+            write_log(f"Not storing {name} result for {path}, loading failed")
+            return data.data
+
+        write_snapshot(snapshot_name, key, data)
+
+    return data
+
+
+def cached_file_metadata(name: str, paths: list[str], loader: Callable[[str], Any]) -> dict[str, Any]:
+    """Return loader(path) for each path, only calling it for files whose mtime or size changed since they were last read"""
+    # path: [mtime, size, metadata]
+    stored: dict[str, list] = read_snapshot(name, "files") or {}
+    entries: dict[str, list] = {}
+
+    for path in paths:
+        stat = xbmcvfs.Stat(path)
+        signature = [stat.st_mtime(), stat.st_size()]
+
+        entry = stored.get(path)
+        entries[path] = entry if entry and entry[:2] == signature else signature + [loader(path)]
+
+    if entries != stored:
+        write_log(f"Updating snapshot {name}, {len(entries)} files")
+        write_snapshot(name, "files", entries)
+
+    return {path: entry[2] for path, entry in entries.items()}
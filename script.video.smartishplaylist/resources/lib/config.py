@@ -2,19 +2,48 @@ import os
 import xbmcvfs
 import json
 import xbmcgui
-from typing import Literal
+import threading
+from contextlib import contextmanager
+from functools import cache
+from typing import Any, Iterator, Literal
 
 addon_id = "script.video.smartishplaylist"
 
-base_path = xbmcvfs.translatePath(f"special://profile/addon_data/{addon_id}/")
+# Serialises creating the data folder and default config, so concurrent first callers do not both write it
+_init_lock = threading.Lock()
 
-if not xbmcvfs.exists(base_path):
-    xbmcvfs.mkdirs(base_path)
+# Parsed config, the (mtime, size) of the file it was read from, whether it has unsaved edits
+_config_cache: dict[str, Any] = {"config": None, "signature": None, "dirty": False}
 
-config_file_path = os.path.join(base_path, "config.json")
+# Depth of nested batched_config_writes() blocks, writes are only saved once this returns to 0
+_write_batch_depth: list[int] = [0]
 
 
-def default_config_file() -> None:
+@cache
+def addon_data_path() -> str:
+    """Return the add-on's data folder, created on first use"""
+    with _init_lock:
+        path: str = xbmcvfs.translatePath(f"special://profile/addon_data/{addon_id}/")
+
+        if not xbmcvfs.exists(path):
+            xbmcvfs.mkdirs(path)
+
+    return path
+
+
+@cache
+def config_file_path() -> str:
+    """Return the config file's path, the default config is written on first use if there is none"""
+    path = os.path.join(addon_data_path(), "config.json")
+
+    with _init_lock:
+        if not xbmcvfs.exists(path):
+            default_config_file(path)
+
+    return path
+
+
+def default_config_file(path: str) -> None:
     """Write empty config file"""
     default_data: dict[str, list] = {
         "movie": [
@@ -29,26 +58,70 @@ def default_config_file() -> None:
         ]
     }
 
-    with xbmcvfs.File(config_file_path, "w") as file_path:
+    with xbmcvfs.File(path, "w") as file_path:
         file_path.write(json.dumps(default_data))
 
 
-if not xbmcvfs.exists(config_file_path):
-    default_config_file()
+def config_signature() -> tuple[int, int]:
+    """Return the config file's (mtime, size), used to notice changes made by other instances"""
+    stat = xbmcvfs.Stat(config_file_path())
+
+    return stat.st_mtime(), stat.st_size()
 
 
 def open_config_file() -> dict[str, list]:
-    """Return config file, dict of lists"""
-    with xbmcvfs.File(config_file_path) as f:
-        configuration: dict[str, list[dict]] = json.load(f)
+    """Return config file, dict of lists, only re-read when the file has changed since it was last read or written
+
+    The returned config is shared, callers that modify it must pass it to write_to_config.
+    """
+    if _config_cache["dirty"]:
+        return _config_cache["config"]
+
+    signature = config_signature()
+
+    if _config_cache["config"] is None or signature != _config_cache["signature"]:
+        with xbmcvfs.File(config_file_path()) as f:
+            configuration: dict[str, list[dict]] = json.load(f)
 
-    return configuration
+        _config_cache.update(config=configuration, signature=signature)
+
+    return _config_cache["config"]
+
+
+def save_config(config: dict[str, list]) -> None:
+    """Atomically replace the config file, a crash mid-write leaves the previous config intact"""
+    temporary_path = f"{config_file_path()}.tmp"
+
+    with xbmcvfs.File(temporary_path, "w") as f:
+        f.write(json.dumps(config))
+
+    os.replace(temporary_path, config_file_path())
+
+    _config_cache.update(config=config, signature=config_signature(), dirty=False)
 
 
 def write_to_config(config: dict[str, list]) -> None:
-    """Write new config"""
-    with open(config_file_path, "w") as f:
-        json.dump(config, f)
+    """Write new config, deferred until the outermost batched_config_writes() block ends if inside one"""
+    if _write_batch_depth[0]:
+        _config_cache.update(config=config, dirty=True)
+        return
+
+    save_config(config)
+
+
+@contextmanager
+def batched_config_writes() -> Iterator[None]:
+    """Coalesce every write_to_config call made inside the block into a single save when it ends"""
+    _write_batch_depth[0] += 1
+
+    try:
+        yield
+
+    finally:
+        _write_batch_depth[0] -= 1
+
+        if _write_batch_depth[0] == 0 and _config_cache["dirty"]:
+            save_config(_config_cache["config"])
 
 
 def clear_config_section(section: Literal["movie", "tvshow"]) -> None:
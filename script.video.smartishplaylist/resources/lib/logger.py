@@ -1,8 +1,83 @@
 import xbmc
+import time
+import xbmcaddon
+from itertools import islice
+from typing import Any, Callable
 
 add_on = "Smart-ish Playlists"
 default_log_level = xbmc.LOGDEBUG
 
+# Collections longer than this are cut short in log messages unless the "log_max_items" setting overrides it
+default_max_log_items = 20
+
+# Seconds between re-checking whether Kodi has debug logging turned on
+debug_check_interval = 5.0
+
+_debug_state: dict[str, float | bool] = {"checked": 0.0, "enabled": False}
+_max_log_items: list[int] = []
+
+
+def debug_logging_enabled() -> bool:
+    """Return whether Kodi currently records debug messages, checked at most every debug_check_interval seconds"""
+    now = time.monotonic()
+
+    if now - _debug_state["checked"] > debug_check_interval:
+        _debug_state["enabled"] = xbmc.getCondVisibility("System.GetBool(debug.showloginfo)")
+        _debug_state["checked"] = now
+
+    return bool(_debug_state["enabled"])
+
+
+def max_log_items() -> int:
+    """Return the number of collection entries kept when logging, read from settings once per run"""
+    if not _max_log_items:
+        try:
+            _max_log_items.append(int(xbmcaddon.Addon().getSetting("log_max_items")))
+        except (ValueError, RuntimeError):
+            _max_log_items.append(default_max_log_items)
+
+    return _max_log_items[0]
+
+
+def summarise(value: Any, max_items: int) -> str:
+    """Return a repr of value where every nested list, tuple, set and dict is cut down to max_items entries"""
+    if max_items <= 0:
+        return repr(value)
+
+    if isinstance(value, dict):
+        entries = [f"{key!r}: {summarise(item, max_items)}" for key, item in islice(value.items(), max_items)]
+        brackets = "{}"
+
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        entries = [summarise(item, max_items) for item in islice(value, max_items)]
+        brackets = "()" if isinstance(value, tuple) else "{}" if isinstance(value, (set, frozenset)) else "[]"
+
+    else:
+        return repr(value)
+
+    if len(value) > max_items:
+        entries.append(f"... {len(value) - max_items} more ({len(value)} total)")
+
+    return brackets[0] + ", ".join(entries) + brackets[1]
+
+
+def write_log(message: str | Callable[[], str], *args: Any, prefix: str = add_on, level=default_log_level):
+    """Log a message, formatting it only if Kodi will record it
+
+    message may be a callable returning the text, or a %-style format string for args.
+    Collection args are summarised to the configured maximum number of items.
+    """
+    if level <= xbmc.LOGDEBUG and not debug_logging_enabled():
+        return
+
+    if callable(message):
+        message = message()
+
+    if args:
+        max_items = max_log_items()
+        message = message % tuple(
+            summarise(arg, max_items) if isinstance(arg, (dict, list, tuple, set, frozenset)) else arg
+            for arg in args
+        )
 
-def write_log(message: str, prefix: str = add_on, level=default_log_level):
     xbmc.log(f"{prefix} :: {message}", level=level)
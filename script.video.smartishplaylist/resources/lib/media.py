@@ -0,0 +1,86 @@
+from array import array
+from itertools import islice
+from typing import Iterable, Iterator
+
+from resources.lib.logger import max_log_items
+
+
+class MediaItems:
+    """Media items of one type: ids in an int array, titles in an id: title table shared with every slice
+
+    Slices are views of the same ids rather than copies, so the source must not grow while a slice is in use.
+    Titles are only looked up when a progress message or log asks for one.
+    """
+
+    __slots__ = ("ids", "titles")
+
+    def __init__(self, ids: array | memoryview | None = None, titles: dict[int, str] | None = None) -> None:
+        self.ids = ids if ids is not None else array("i")
+        self.titles = titles if titles is not None else {}
+
+    @classmethod
+    def from_items(cls, items: Iterable[dict]) -> "MediaItems":
+        """Return the compact form of {"id": ..., "title": ...} dicts"""
+        media = cls()
+
+        for item in items:
+            media.append(item.get("id"), item.get("title"))
+
+        return media
+
+    @classmethod
+    def from_rows(cls, rows: dict[str, list]) -> "MediaItems":
+        """Return media stored by to_rows()"""
+        ids: list[int] = rows.get("ids", [])
+
+        return cls(array("i", ids), {item_id: title for item_id, title in zip(ids, rows.get("titles", [])) if title is not None})
+
+    @classmethod
+    def concat(cls, parts: Iterable["MediaItems"]) -> "MediaItems":
+        """Return the items of every part in order, in a new array with the parts' title tables merged"""
+        media = cls()
+
+        for part in parts:
+            media.ids.extend(part.ids)
+            if part.titles is not media.titles:
+                media.titles.update(part.titles)
+
+        return media
+
+    def append(self, item_id: int, title: str | None = None) -> None:
+        self.ids.append(item_id)
+
+        if title is not None:
+            self.titles[item_id] = title
+
+    def title(self, item_id: int) -> str:
+        """Return an item's title, or its id if the title is unknown"""
+        return self.titles.get(item_id, str(item_id))
+
+    def to_rows(self) -> dict[str, list]:
+        """Return the ids and their titles as parallel lists, for storing as JSON"""
+        ids: list[int] = self.ids.tolist()
+
+        return {"ids": ids, "titles": [self.titles.get(item_id) for item_id in ids]}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.ids)
+
+    def __getitem__(self, index: int | slice) -> "int | MediaItems":
+        if isinstance(index, slice):
+            ids = self.ids if isinstance(self.ids, memoryview) else memoryview(self.ids)
+            return MediaItems(ids[index], self.titles)
+
+        return self.ids[index]
+
+    def __repr__(self) -> str:
+        max_items = max_log_items() or len(self)
+        entries = [f"{item_id}: {self.title(item_id)!r}" for item_id in islice(self.ids, max_items)]
+
+        if len(self) > max_items:
+            entries.append(f"... {len(self) - max_items} more ({len(self)} total)")
+
+        return "{" + ", ".join(entries) + "}"
@@ -0,0 +1,135 @@
+import os
+import time
+import threading
+import xbmcvfs
+from contextlib import contextmanager
+from typing import Iterator
+
+from resources.lib.config import addon_data_path
+
+# Upper bounds in seconds of the latency histogram buckets, slower calls are counted in a final open-ended bucket
+latency_buckets = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+_lock = threading.Lock()
+
+# method: calls, requests, seconds, max_seconds, histogram, sent, received, encode_seconds, decode_seconds
+_rpc_metrics: dict[str, dict] = {}
+
+# phase: [count, seconds], in the order phases first finished
+_spans: dict[str, list] = {}
+
+
+def report_file_path() -> str:
+    """Return where the latest build report is saved"""
+    return os.path.join(addon_data_path(), "build_report.txt")
+
+
+def reset() -> None:
+    """Forget everything recorded so far, called at the start of each build"""
+    with _lock:
+        _rpc_metrics.clear()
+        _spans.clear()
+
+
+def record_rpc(
+    method: str,
+    seconds: float,
+    sent: int,
+    received: int,
+    encode_seconds: float,
+    decode_seconds: float,
+    requests: int = 1,
+) -> None:
+    """Record one executeJSONRPC call, a batch counts as one call of several requests
+
+    Sizes are the lengths of the JSON texts, equal to bytes for Kodi's ASCII-escaped JSON.
+    """
+    bucket = next((index for index, bound in enumerate(latency_buckets) if seconds <= bound), len(latency_buckets))
+
+    with _lock:
+        metrics = _rpc_metrics.setdefault(
+            method,
+            {
+                "calls": 0,
+                "requests": 0,
+                "seconds": 0.0,
+                "max_seconds": 0.0,
+                "histogram": [0] * (len(latency_buckets) + 1),
+                "sent": 0,
+                "received": 0,
+                "encode_seconds": 0.0,
+                "decode_seconds": 0.0,
+            },
+        )
+        metrics["calls"] += 1
+        metrics["requests"] += requests
+        metrics["seconds"] += seconds
+        metrics["max_seconds"] = max(metrics["max_seconds"], seconds)
+        metrics["histogram"][bucket] += 1
+        metrics["sent"] += sent
+        metrics["received"] += received
+        metrics["encode_seconds"] += encode_seconds
+        metrics["decode_seconds"] += decode_seconds
+
+
+@contextmanager
+def span(phase: str) -> Iterator[None]:
+    """Time a build phase, repeated phases are added up"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+
+        with _lock:
+            totals = _spans.setdefault(phase, [0, 0.0])
+            totals[0] += 1
+            totals[1] += elapsed
+
+
+def report_text() -> str:
+    """Return phase timings, per method JSON-RPC totals and latency histograms as plain text"""
+    with _lock:
+        spans = {phase: list(totals) for phase, totals in _spans.items()}
+        rpc_metrics = {method: dict(metrics) for method, metrics in _rpc_metrics.items()}
+
+    lines = [f"Build report {time.strftime('%Y-%m-%d %H:%M:%S')}", "", "Phases (times run, seconds)"]
+    lines += [f"  {phase:<20} {count:>5} {seconds:>9.3f}s" for phase, (count, seconds) in spans.items()]
+
+    rpc_seconds = sum(metrics["seconds"] for metrics in rpc_metrics.values())
+    json_seconds = sum(metrics["encode_seconds"] + metrics["decode_seconds"] for metrics in rpc_metrics.values())
+
+    lines += [
+        "",
+        f"JSON-RPC: {rpc_seconds:.3f}s waiting on Kodi, {json_seconds:.3f}s encoding and decoding JSON",
+        f"  {'method':<40} {'calls':>6} {'requests':>8} {'total':>9} {'mean':>8} {'max':>8} "
+        f"{'sent KiB':>9} {'recv KiB':>9} {'encode':>8} {'decode':>8}",
+    ]
+
+    for method, metrics in sorted(rpc_metrics.items(), key=lambda entry: -entry[1]["seconds"]):
+        lines.append(
+            f"  {method:<40} {metrics['calls']:>6} {metrics['requests']:>8} {metrics['seconds']:>8.3f}s "
+            f"{metrics['seconds'] / metrics['calls']:>7.3f}s {metrics['max_seconds']:>7.3f}s "
+            f"{metrics['sent'] / 1024:>9.1f} {metrics['received'] / 1024:>9.1f} "
+            f"{metrics['encode_seconds']:>7.3f}s {metrics['decode_seconds']:>7.3f}s"
+        )
+
+    bucket_names = [f"<={bound * 1000:g}ms" for bound in latency_buckets] + [f">{latency_buckets[-1] * 1000:g}ms"]
+
+    lines += ["", "JSON-RPC latency histogram (calls per bucket)", f"  {'method':<40} " + " ".join(f"{name:>8}" for name in bucket_names)]
+    lines += [
+        f"  {method:<40} " + " ".join(f"{count:>8}" for count in metrics["histogram"])
+        for method, metrics in sorted(rpc_metrics.items())
+    ]
+
+    return "\n".join(lines)
+
+
+def write_report() -> str:
+    """Write the report under addon_data, replacing the previous build's, and return its text"""
+    text = report_text()
+
+    with xbmcvfs.File(report_file_path(), "w") as f:
+        f.write(text)
+
+    return text
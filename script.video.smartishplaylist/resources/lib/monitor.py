@@ -0,0 +1,46 @@
+import xbmc
+import threading
+from typing import Callable
+
+from resources.lib.cache import RevisionKind, bump_library_revision
+from resources.lib.logger import write_log
+
+# Notification: library revisions it advances
+library_change_notifications: dict[str, tuple[RevisionKind, ...]] = {
+    "VideoLibrary.OnScanFinished": ("library", "content"),
+    "VideoLibrary.OnCleanFinished": ("library", "content"),
+    "VideoLibrary.OnRemove": ("library", "content"),
+    "VideoLibrary.OnUpdate": ("content",),
+}
+
+
+class LibraryMonitor(xbmc.Monitor):
+    """Monitor that invalidates library snapshots and cached results whenever Kodi reports a library change
+
+    Changes are collected and written by flush_revisions(), so a scan's stream of updates costs one write per flush.
+    Every notification is also passed to the listeners, called with (sender, method, data) on Kodi's callback thread.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.pending_revisions: set[str] = set()
+        self.lock = threading.Lock()
+        self.listeners: list[Callable[[str, str, str], None]] = []
+
+    def onNotification(self, sender: str, method: str, data: str) -> None:
+        for listener in self.listeners:
+            listener(sender, method, data)
+
+        if method in library_change_notifications:
+            with self.lock:
+                self.pending_revisions.update(library_change_notifications[method])
+
+    def flush_revisions(self) -> None:
+        """Advance every revision touched by a notification since the last flush"""
+        with self.lock:
+            kinds = tuple(sorted(self.pending_revisions))
+            self.pending_revisions.clear()
+
+        if kinds:
+            write_log(f"Library changed, advancing {kinds}")
+            bump_library_revision(kinds)
@@ -1,19 +1,33 @@
 import xbmc
 import xbmcaddon
 import json
+import time
 import random
-from typing import Literal
+from typing import Callable, Iterator, Literal
 import threading
-from queue import Queue
+import traceback
+from array import array
+from collections import Counter
+from queue import Queue, Empty
 
 from resources.lib.queries import (
-    list_of_episodes_by_show_id,
+    list_of_episodes_by_show_ids,
+    list_of_episode_ids_by_show_ids,
+    episode_titles_by_ids,
     find_linked_movies_by_show_title,
+    rpc_batch_size,
     kodi_rpc,
+    kodi_rpc_batch,
+    playlist_items,
     single_smart_playlist_info
 )
 from resources.lib.config import open_config_file
+from resources.lib.cache import Uncached, cached_file_result, stored_file_result
 from resources.lib.logger import write_log
+from resources.lib.workers import ordered_map
+from resources.lib.progress import ProgressReporter
+from resources.lib.media import MediaItems
+from resources.lib.metrics import span
 
 
 def clear_playlist(playlist_id: int = 1) -> None:
@@ -30,9 +44,15 @@ def clear_playlist(playlist_id: int = 1) -> None:
 
 
 def add_to_playlist(
-    content_type: Literal["movie", "episode"], item_id: int | list[int], playlist_id: int = 1
+    content_type: Literal["movie", "episode"],
+    item_id: int | list[int],
+    playlist_id: int = 1,
+    position: int | None = None,
 ) -> None:
-    """Add single or list of episode(s) or movie(s) to a given playlist using its content type and id numbers"""
+    """Add single or list of episode(s) or movie(s) to a given playlist using its content type and id numbers
+
+    Items are appended, or inserted at position if given.
+    """
 
     if isinstance(item_id, int):
         item_id = [item_id]
@@ -46,13 +66,73 @@ def add_to_playlist(
         "id": 1,
     }
 
-    write_log(f"add to playlist {add_to_playlist_payload}")
+    if position is not None:
+        add_to_playlist_payload["method"] = "Playlist.Insert"
+        add_to_playlist_payload["params"]["position"] = position
+
+    write_log("add to playlist %s", add_to_playlist_payload)
 
     kodi_rpc(add_to_playlist_payload, return_result=False)
-    write_log(f"Added {content_type} ids {item_id} to playlist {playlist_id}")
+    write_log("Added %s ids %s to playlist %s", content_type, item_id, playlist_id)
+
+
+def remove_from_playlist(positions: list[int], playlist_id: int = 1) -> None:
+    """Remove the items at the given positions of a playlist"""
+    # Highest position first, so each removal leaves the positions still to be removed unchanged
+    payloads = [
+        {"jsonrpc": "2.0", "method": "Playlist.Remove", "params": {"playlistid": playlist_id, "position": position}, "id": 1}
+        for position in sorted(positions, reverse=True)
+    ]
+
+    kodi_rpc_batch(payloads)
+    write_log("Removed positions %s from playlist %s", positions, playlist_id)
+
+
+def playlist_changes(
+    current_items: list[dict], media_info: dict[str, MediaItems]
+) -> tuple[list[int], dict[str, MediaItems], int]:
+    """Return what turns the current playlist items into media_info without touching items that stay
+
+    That is the positions to remove, the media items to add and the position after the last movie kept,
+    where new movies are inserted so movies stay ahead of episodes as in a full build.
+    """
+    wanted = Counter(
+        (media_type, item_id) for media_type, media_items in media_info.items() for item_id in media_items
+    )
+    kept: Counter = Counter()
+
+    removals: list[int] = []
+    kept_count = 0
+    movie_position = 0
+
+    for position, item in enumerate(current_items):
+        key = (item.get("type"), item.get("id"))
+
+        if kept[key] < wanted[key]:
+            kept[key] += 1
+            kept_count += 1
+            if key[0] == "movie":
+                movie_position = kept_count
+        else:
+            removals.append(position)
+
+    additions: dict[str, MediaItems] = {}
+
+    for media_type, media_items in media_info.items():
+        additions[media_type] = MediaItems(array("i"), media_items.titles)
+
+        for item_id in media_items:
+            key = (media_type, item_id)
+
+            if kept[key]:
+                kept[key] -= 1
+            else:
+                additions[media_type].ids.append(item_id)
 
+    return removals, additions, movie_position
 
-def gather_single_show_info(show_id:int, title:str, exclusions:list[dict], number_of_episodes:int, all_show_episodes:list[dict]) -> list[dict]:
+
+def gather_single_show_info(show_id:int, title:str, exclusions:list[dict], number_of_episodes:int, all_show_episodes:list[tuple]) -> MediaItems:
     """Return applicable episodes for a given show"""
 
     excluded_episodes: dict[int, str] = {
@@ -62,64 +142,124 @@ def gather_single_show_info(show_id:int, title:str, exclusions:list[dict], numbe
     write_log(
         f"Gathering {number_of_episodes} episodes from TV Show {title} id: {show_id}"
     )
-    write_log(f"Exclusions: {excluded_episodes}")
+    write_log("Exclusions: %s", excluded_episodes)
 
-    non_excluded_episodes: list[dict] = [
-        {"id": item.get("episodeid"), "title": item.get("title")}
-        for item in all_show_episodes
-        if item.get("episodeid") not in excluded_episodes.keys()
+    non_excluded_episodes: list[tuple] = [
+        item for item in all_show_episodes if item.id not in excluded_episodes
     ]
 
-    if number_of_episodes >= len(non_excluded_episodes):
-        selection: list[dict] = non_excluded_episodes
+    if number_of_episodes < len(non_excluded_episodes):
+        non_excluded_episodes = random.sample(non_excluded_episodes, number_of_episodes)
 
-    else:
-        selection: list[dict] = random.sample(
-            non_excluded_episodes, number_of_episodes
-        )
+    selection = MediaItems(
+        array("i", [item.id for item in non_excluded_episodes]),
+        {item.id: item.title for item in non_excluded_episodes},
+    )
 
-    write_log(f"Selection: {selection}")
+    write_log("Selection: %s", selection)
 
     return selection
 
 
-def gather_shows_info(
-        defined_show_criteria: list[dict], default_number_of_episodes:int, monitor:xbmc.Monitor
-) -> list[dict]:
-    """Return applicable episodes for each show"""
-    episodes = []
-
-    for show in defined_show_criteria:
-        show_id: int = show.get("id")
-        title: str = show.get("title")
-        exclusions:list[dict] = show.get("exclusions", [])
-
-        number_of_episodes: int = show.get(
-            "number_of_episodes", default_number_of_episodes
-        )
+def sample_episode_ids(episode_ids: list[int], exclusions: list[dict], number_of_episodes: int) -> list[int]:
+    """Return exactly number_of_episodes random ids that are not excluded, or every eligible id if there are fewer"""
+    excluded_ids: set[int] = {item.get("id") for item in exclusions}
+    eligible_ids: list[int] = [episode_id for episode_id in episode_ids if episode_id not in excluded_ids]
+
+    if number_of_episodes >= len(eligible_ids):
+        return eligible_ids
+
+    return random.sample(eligible_ids, number_of_episodes)
 
-        # Limit query to reduce load
-        all_show_episodes: list[dict] = list_of_episodes_by_show_id(
-            show_id=show_id, number=(number_of_episodes + len(exclusions) * 2)
-        )
 
-        selection = gather_single_show_info(
-            show_id=show_id,
-            title=title,
-            exclusions=exclusions,
+def gather_show_batch_episodes(
+        shows: list[dict], default_number_of_episodes: int, exact_sampling: bool = False
+) -> MediaItems:
+    """Query a batch of configured shows in a single request and return their applicable episodes
+
+    With exact sampling, episodes are drawn locally from each show's cached episode ids and only the chosen
+    episodes' titles are queried, otherwise Kodi is asked for a random over-sized sample per show.
+    """
+    numbers_of_episodes: list[int] = [
+        show.get("number_of_episodes", default_number_of_episodes) for show in shows
+    ]
+
+    if exact_sampling:
+        all_shows_episode_ids: list[list[int]] = list_of_episode_ids_by_show_ids([show.get("id") for show in shows])
+
+        selected_ids: list[int] = []
+        for show, number_of_episodes, episode_ids in zip(shows, numbers_of_episodes, all_shows_episode_ids):
+            write_log(f"Sampling {number_of_episodes} of {len(episode_ids)} episodes from TV Show {show.get('title')}")
+            selected_ids += sample_episode_ids(episode_ids, show.get("exclusions", []), number_of_episodes)
+
+        titles: dict[int, str] = episode_titles_by_ids(selected_ids)
+
+        if len(titles) < len(selected_ids):
+            write_log(f"{len(selected_ids) - len(titles)} selected episodes are no longer in the library")
+
+        # The title table from the query is used as is
+        episodes = MediaItems(array("i", [episode_id for episode_id in selected_ids if episode_id in titles]), titles)
+        write_log("Selection: %s", episodes)
+
+        return episodes
+
+    # Limit query to reduce load
+    all_shows_episodes: list[list[tuple]] = list_of_episodes_by_show_ids(
+        show_ids=[show.get("id") for show in shows],
+        numbers=[
+            number_of_episodes + len(show.get("exclusions", [])) * 2
+            for show, number_of_episodes in zip(shows, numbers_of_episodes)
+        ],
+    )
+
+    episodes = MediaItems.concat(
+        gather_single_show_info(
+            show_id=show.get("id"),
+            title=show.get("title"),
+            exclusions=show.get("exclusions", []),
             number_of_episodes=number_of_episodes,
             all_show_episodes=all_show_episodes
         )
+        for show, number_of_episodes, all_show_episodes in zip(shows, numbers_of_episodes, all_shows_episodes)
+    )
 
-        episodes += selection
+    return episodes
+
+
+def gather_shows_info(
+        defined_show_criteria: list[dict],
+        default_number_of_episodes:int,
+        monitor:xbmc.Monitor,
+        cancel_event: threading.Event | None = None,
+        max_workers: int = 1,
+        media_queue: Queue | None = None,
+        exact_sampling: bool = False,
+) -> MediaItems:
+    """Return applicable episodes for each show, querying batches of shows with up to max_workers batches at once
+
+    If a media queue is provided, each batch's episodes are also put on it as soon as they are selected.
+    """
+    show_batches: list[list[dict]] = [
+        defined_show_criteria[i:i + rpc_batch_size] for i in range(0, len(defined_show_criteria), rpc_batch_size)
+    ]
 
-        if monitor.waitForAbort(0.01):
-            break
+    selections: list[MediaItems] = ordered_map(
+        lambda shows: gather_show_batch_episodes(shows, default_number_of_episodes, exact_sampling),
+        show_batches,
+        monitor=monitor,
+        cancel_event=cancel_event,
+        max_workers=max_workers,
+        on_result=None if media_queue is None else (
+            lambda index, selection: media_queue.put(("episode", selection, (index + 1) / len(show_batches)))
+        ),
+    )
+
+    episodes = MediaItems.concat(selections)
 
     return episodes
 
 
-def gather_movies_info(selected_movies:list[dict], number_of_movies:int) -> list[dict]:
+def gather_movies_info(selected_movies:list[dict], number_of_movies:int) -> MediaItems:
     """Return a selection of movies"""
     if number_of_movies >= len(selected_movies):
         final_movie_selection: list[dict] = selected_movies
@@ -128,97 +268,282 @@ def gather_movies_info(selected_movies:list[dict], number_of_movies:int) -> list
             selected_movies, number_of_movies
         )
 
-    return final_movie_selection
+    return MediaItems.from_items(final_movie_selection)
+
 
+def gather_media_info(
+        monitor: xbmc.Monitor, cancel_event: threading.Event | None = None, media_queue: Queue | None = None
+) -> dict[str, MediaItems]:
+    """Select applicable number of movies, episodes, exclude were applicable
 
-def gather_media_info(monitor: xbmc.Monitor) -> dict[str, list]:
-    """Select applicable number of movies, episodes, exclude were applicable"""
+    If a media queue is provided, (media type, items, share of sources gathered) entries are put on it as each
+    selection is ready so a playlist can be built while gathering continues.
+    """
     addon = xbmcaddon.Addon()
 
     config: dict[str, list] = open_config_file()
 
+    selected_movies: list[dict] = config.get("movie")
+    number_of_movies: int = json.loads(addon.getSetting("number_of_movies"))
+
+    movies = gather_movies_info(selected_movies=selected_movies, number_of_movies=number_of_movies)
+
+    if media_queue is not None:
+        media_queue.put(("movie", movies, 0.0))
+
     defined_show_criteria: list[dict] = config.get("tvshow")
     default_number_of_episodes: int = json.loads(
         addon.getSetting("default_number_of_episodes")
     )
 
+    max_workers: int = int(addon.getSetting("worker_threads"))
+
     episodes = gather_shows_info(
         defined_show_criteria=defined_show_criteria,
         default_number_of_episodes=default_number_of_episodes,
-        monitor=monitor
+        monitor=monitor,
+        cancel_event=cancel_event,
+        max_workers=max_workers,
+        media_queue=media_queue,
+        exact_sampling=addon.getSettingBool("exact_sampling"),
     )
 
-    selected_movies: list[dict] = config.get("movie")
-    number_of_movies: int = json.loads(addon.getSetting("number_of_movies"))
-
-    movies = gather_movies_info(selected_movies=selected_movies, number_of_movies=number_of_movies)
-
-    write_log(f"movie: {movies}, episode: {episodes}")
+    write_log("movie: %s, episode: %s", movies, episodes)
 
     return {"movie": movies, "episode": episodes}
 
 
-def gather_single_smart_playlist_media(files: list[dict]) -> tuple[list[dict], list[dict]]:
+def gather_single_smart_playlist_media(files: list[dict]) -> tuple[MediaItems, MediaItems]:
     """Extract applicable media info from a smart playlist files selection"""
-    episodes = []
-    movies = []
+    episodes = MediaItems()
+    movies = MediaItems()
+
+    # Expand every TV Show in one batched query rather than one request per show
+    show_ids: list[int] = [item.get("id") for item in files if item.get("type") == "tvshow"]
+    episodes_by_show_id: dict[int, list[tuple]] = dict(
+        zip(show_ids, list_of_episodes_by_show_ids(show_ids))
+    )
 
     for item in files:
         item_id = item.get("id")
 
         if item.get("type") == "episode":
-            episodes.append({"id": item_id, "title": item.get("label")})
+            episodes.append(item_id, item.get("label"))
 
         elif item.get("type") == "movie":
-            movies.append({"id": item_id, "title": item.get("label")})
+            movies.append(item_id, item.get("label"))
 
         elif item.get("type") == "tvshow":
             title = item.get("label")
-            show_episodes = list_of_episodes_by_show_id(item_id)
+            show_episodes = episodes_by_show_id.get(item_id, [])
             show_movies = find_linked_movies_by_show_title(title)
 
             for episode in show_episodes:
-                episodes.append({"id": episode.get("episodeid"), "title": episode.get("title")})
+                episodes.append(episode.id, episode.title)
 
             for movie in show_movies:
-                movies.append({"id": movie.get("movieid"), "title": movie.get("title")})
+                movies.append(movie.id, movie.title)
 
     return episodes, movies
 
 
-def gather_all_smart_playlist_info(monitor: xbmc.Monitor) -> dict[str, list[dict]]:
-    """Return media items from smart playlists"""
+def smart_playlist_media(path: str) -> tuple[MediaItems, MediaItems]:
+    """Return episodes and movies of a smart playlist, reused while neither the .xsp file nor the library has changed"""
+
+    def evaluate() -> list[dict[str, list]] | Uncached:
+        response: dict | None = single_smart_playlist_info(path)
+
+        # A failed request is not stored, otherwise the playlist would stay empty until its file or the library changes
+        if not response or "result" not in response:
+            return Uncached([MediaItems().to_rows(), MediaItems().to_rows()])
+
+        files = response["result"].get("files", [])
+        return [media.to_rows() for media in gather_single_smart_playlist_media(files)]
+
+    episodes, movies = cached_file_result("smart_playlist_items", path, evaluate)
+
+    return MediaItems.from_rows(episodes), MediaItems.from_rows(movies)
+
+
+def count_single_smart_playlist_media(files: list[dict]) -> tuple[int, int]:
+    """Count the episodes and movies a smart playlist files selection expands to, without listing any episodes
+
+    TV Shows are counted from their 'episode' property and their linked movies from the showlink index.
+    """
+    episode_count = 0
+    movie_count = 0
+
+    for item in files:
+        if item.get("type") == "episode":
+            episode_count += 1
+
+        elif item.get("type") == "movie":
+            movie_count += 1
+
+        elif item.get("type") == "tvshow":
+            episode_count += item.get("episode", 0)
+            movie_count += len(find_linked_movies_by_show_title(item.get("label")))
+
+    return episode_count, movie_count
+
+
+def smart_playlist_counts(path: str) -> tuple[int, int]:
+    """Return the number of episodes and movies in a smart playlist, from a cached result when one is still valid"""
+    stored: list[dict[str, list]] | None = stored_file_result("smart_playlist_items", path)
+
+    if stored is not None:
+        episodes, movies = stored
+        return len(episodes["ids"]), len(movies["ids"])
+
+    files = (single_smart_playlist_info(path, properties=["episode"]) or {}).get("result", {}).get("files", [])
+
+    return count_single_smart_playlist_media(files)
+
+
+def gather_all_smart_playlist_info(
+        monitor: xbmc.Monitor, cancel_event: threading.Event | None = None, media_queue: Queue | None = None
+) -> dict[str, MediaItems]:
+    """Return media items from smart playlists, evaluating up to 'worker_threads' playlists at once
+
+    Results are merged in configured playlist order, and also put on the media queue per playlist if provided.
+    """
+    addon = xbmcaddon.Addon()
 
     config:dict[str, list] = open_config_file()
     playlists:list[dict] = config.get("smart")
 
-    episodes = []
-    movies = []
+    max_workers: int = int(addon.getSetting("worker_threads"))
 
-    for playlist in playlists:
+    def gather_playlist(playlist: dict) -> tuple[MediaItems, MediaItems]:
         title:str = playlist.get("title")
         path:str = playlist.get("path")
 
         write_log(f"Gathering media items for {title}: {path}")
 
-        items = single_smart_playlist_info(path)
-        files = items.get("result", {}).get("files", [])
+        return smart_playlist_media(path)
 
-        playlist_episodes, playlist_movies = gather_single_smart_playlist_media(files)
+    def stream_playlist(index: int, playlist_media: tuple[MediaItems, MediaItems]) -> None:
+        progress = (index + 1) / len(playlists)
+        media_queue.put(("movie", playlist_media[1], progress))
+        media_queue.put(("episode", playlist_media[0], progress))
 
-        episodes += playlist_episodes
-        movies += playlist_movies
+    results: list[tuple[MediaItems, MediaItems]] = ordered_map(
+        gather_playlist,
+        playlists,
+        monitor=monitor,
+        cancel_event=cancel_event,
+        max_workers=max_workers,
+        on_result=None if media_queue is None else stream_playlist,
+    )
 
-        if monitor.waitForAbort(0.01):
-            break
+    episodes = MediaItems.concat(playlist_episodes for playlist_episodes, _ in results)
+    movies = MediaItems.concat(playlist_movies for _, playlist_movies in results)
 
-    write_log(f"movie: {movies}, episode: {episodes}")
+    write_log("movie: %s, episode: %s", movies, episodes)
 
     return {"movie": movies, "episode": episodes}
 
 
-def define_chunks(media_info:dict[str,list[dict]], chunk_by_size:bool, number_of_chunks:int, chunk_size:int) -> tuple[bool, int, dict]:
-    """Split media into chunks for adding to playlist based upon provided criteria"""
+# playlist_type setting: gather function for that playlist type
+playlist_gatherers: dict[int, Callable[..., dict[str, MediaItems]]] = {
+    0: gather_media_info,
+    1: gather_all_smart_playlist_info,
+}
+
+
+# Put on the media queue in place of None when gathering raised, so the build ends as interrupted
+gather_failed = "gather_failed"
+
+
+def gather_into_queue(
+        gather: Callable[..., dict[str, MediaItems]],
+        media_queue: Queue,
+        monitor: xbmc.Monitor,
+        cancel_event: threading.Event,
+) -> None:
+    """Run a gather function that streams onto the media queue, then mark the queue finished with None
+
+    If gathering raises, the exception is logged and gather_failed is put on the queue instead.
+    """
+    end_marker: str | None = gather_failed
+
+    try:
+        with span("gather"):
+            gather(monitor=monitor, cancel_event=cancel_event, media_queue=media_queue)
+        end_marker = None
+
+    except Exception as e:
+        write_log(f"Exception while gathering media: {e}", level=xbmc.LOGERROR)
+        write_log(traceback.format_exc(), level=xbmc.LOGERROR)
+
+    finally:
+        media_queue.put(end_marker)
+
+
+def unseen_items(items: MediaItems, seen_ids: set[int]) -> MediaItems:
+    """Return items whose id is not in seen_ids, in order and without repeats, adding their ids to seen_ids"""
+    unique = array("i")
+
+    for item_id in items:
+        if item_id not in seen_ids:
+            seen_ids.add(item_id)
+            unique.append(item_id)
+
+    return MediaItems(unique, items.titles)
+
+
+def deduplicate_media(media_info: dict[str, MediaItems]) -> tuple[dict[str, MediaItems], int]:
+    """Return media with repeated ids of each media type removed, keeping first occurrences in order, and the number removed"""
+    deduplicated: dict[str, MediaItems] = {
+        media_type: unseen_items(items, set()) for media_type, items in media_info.items()
+    }
+
+    removed = sum(len(items) for items in media_info.values()) - sum(len(items) for items in deduplicated.values())
+
+    write_log(f"Removed {removed} duplicate items", level=xbmc.LOGINFO)
+
+    return deduplicated, removed
+
+
+class AdaptiveChunkSize:
+    """Chunk size steered toward a target Playlist.Add duration
+
+    The size grows by a fixed step after each full chunk added within the target and is halved after any slower call.
+    """
+
+    def __init__(
+        self, target_seconds: float, initial: int = 25, increase: int = 25, minimum: int = 1, maximum: int = 1000
+    ) -> None:
+        self.target_seconds = target_seconds
+        self.size = max(minimum, min(initial, maximum))
+        self.increase = increase
+        self.minimum = minimum
+        self.maximum = maximum
+        self.sizes: list[int] = []
+
+    def record(self, items: int, seconds: float) -> None:
+        """Adjust the size after adding a chunk of items that took seconds"""
+        self.sizes.append(items)
+
+        if seconds > self.target_seconds:
+            self.size = max(self.minimum, self.size // 2)
+        elif items >= self.size:
+            self.size = min(self.maximum, self.size + self.increase)
+
+        write_log(f"Added {items} items in {seconds:.3f}s, next chunk size {self.size}")
+
+    def chunks(self, media_items: MediaItems) -> Iterator[MediaItems]:
+        """Yield consecutive chunks of media_items, each sized when it is taken"""
+        start = 0
+        while start < len(media_items):
+            chunk = media_items[start:start + self.size]
+            yield chunk
+            # record() may have resized since the yield, so advance by what was actually taken
+            start += len(chunk)
+
+
+def define_chunks(media_info:dict[str,MediaItems], chunk_by_size:bool, number_of_chunks:int, chunk_size:int) -> tuple[bool, int, dict]:
+    """Split media into chunks for adding to playlist based upon provided criteria, chunks are views sharing the media's ids"""
     super_slow = False
 
     total_items = 0
@@ -228,12 +553,12 @@ def define_chunks(media_info:dict[str,list[dict]], chunk_by_size:bool, number_of
     # Split into chunks by number or size
     for media_type, media_items in media_info.items():
         if chunk_by_size:
-            chunks:list[list[dict]] = [media_items[i:i + chunk_size] for i in range(0, len(media_items), chunk_size)]
+            chunks:list[MediaItems] = [media_items[i:i + chunk_size] for i in range(0, len(media_items), chunk_size)]
             if chunk_size == 1:
                 super_slow = True
         else:
             k, m = divmod(len(media_items), number_of_chunks)
-            chunks: list[list[dict]] = [media_items[i*k + min(i, m):(i+1)*k + min(i+1, m)]for i in range(number_of_chunks)]
+            chunks: list[MediaItems] = [media_items[i*k + min(i, m):(i+1)*k + min(i+1, m)]for i in range(number_of_chunks)]
 
         for chunk in chunks:
             total_items += len(chunk)
@@ -242,31 +567,101 @@ def define_chunks(media_info:dict[str,list[dict]], chunk_by_size:bool, number_of
     return super_slow, total_items, media_chunks
 
 
+def add_chunk_with_progress(
+    media_type: Literal["movie", "episode"],
+    chunk: MediaItems,
+    playlist_id: int,
+    progress: ProgressReporter,
+    percent: int,
+    remaining_text: str,
+    super_slow: bool = False,
+    position: int | None = None,
+) -> float:
+    """Add a chunk of media items to a playlist, report it as progress and return the seconds Playlist.Add took"""
+    write_log("Adding %s chunk %s", media_type, chunk)
+
+    ids: list[int] = chunk.ids.tolist()
+
+    start = time.perf_counter()
+    with span("add"):
+        add_to_playlist(content_type=media_type, item_id=ids, playlist_id=playlist_id, position=position)
+    elapsed = time.perf_counter() - start
+
+    write_log(f"{percent}% complete")
+    if super_slow:
+        media_title = chunk.title(chunk[0])
+        progress.update(percent, f"Added {media_type}: {media_title} {remaining_text}")
+    else:
+        progress.update(percent, f"{len(chunk)} {media_type}s added {remaining_text}")
+
+    return elapsed
+
+
 def playlist_builder(
-    media_info: dict[str,list[dict]],
+    media_info: dict[str,MediaItems],
     monitor: xbmc.Monitor,
-    progress_queue: Queue,
+    progress: ProgressReporter,
     cancel_event: threading.Event,
     clear_existing: bool = True,
     playlist_id: int = 1,
     chunk_by_size:bool = True,
     number_of_chunks:int = 10,
     chunk_size:int = 25,
+    chunk_sizer: AdaptiveChunkSize | None = None,
+    incremental: bool = False,
 ) -> bool:
-    """Add each media item to a given playlist"""
+    """Add each media item to a given playlist
+
+    With a chunk_sizer, chunks are sized as they are added instead of by the size/number criteria.
+    If incremental, only items missing from the current playlist are added and items not in media_info removed,
+    unless that takes more changes than a full rebuild.
+    """
+    movie_position: int | None = None
+
+    if incremental:
+        with span("diff"):
+            removals, additions, movie_position = playlist_changes(playlist_items(playlist_id), media_info)
+
+        changes = len(removals) + sum(len(media_items) for media_items in additions.values())
+        rebuild = sum(len(media_items) for media_items in media_info.values())
+
+        if changes < rebuild:
+            write_log(f"Updating playlist {playlist_id}: {len(removals)} removals, {changes - len(removals)} additions")
+
+            if removals:
+                progress.update(0, f"Removing {len(removals)} items")
+                with span("remove"):
+                    remove_from_playlist(removals, playlist_id=playlist_id)
+
+            media_info = additions
+            clear_existing = False
+
+        else:
+            write_log(f"Rebuilding playlist {playlist_id}, {changes} changes would exceed {rebuild} additions")
+            movie_position = None
+
     if clear_existing:
         write_log(f"Clearing playlist {playlist_id}")
         clear_playlist(playlist_id=playlist_id)
 
-    super_slow, total_items, media_chunks = define_chunks(
-        media_info=media_info,
-        chunk_by_size=chunk_by_size,
-        number_of_chunks=number_of_chunks,
-        chunk_size=chunk_size
-    )
+    media_chunks: dict[str, list[MediaItems] | Iterator[MediaItems]]
+
+    if chunk_sizer is None:
+        with span("chunk"):
+            super_slow, total_items, media_chunks = define_chunks(
+                media_info=media_info,
+                chunk_by_size=chunk_by_size,
+                number_of_chunks=number_of_chunks,
+                chunk_size=chunk_size
+            )
 
-    write_log(f"Total chunks to add: {len(media_chunks)}")
-    write_log(f"Chunks: {media_chunks}")
+        write_log(f"Total chunks to add: {len(media_chunks)}")
+        write_log("Chunks: %s", media_chunks)
+
+    else:
+        super_slow = False
+        total_items = sum(len(media_items) for media_items in media_info.values())
+        media_chunks = {media_type: chunk_sizer.chunks(media_items) for media_type, media_items in media_info.items()}
 
     items_completed = 0
     remaining_items = total_items
@@ -277,26 +672,149 @@ def playlist_builder(
         for chunk in chunks:
             if cancel_event.is_set():
                 return False
-            write_log(f"Adding {media_type} chunk {chunk}")
-
-            ids = [item.get("id") for item in chunk]
 
-            add_to_playlist(content_type=media_type, item_id=ids, playlist_id=playlist_id)
+            if not chunk:
+                continue
 
             items_completed += len(chunk)
             remaining_items -= len(chunk)
             percent = int(items_completed / total_items * 100)
-            write_log(f"{percent}% complete")
-            if super_slow:
-                item:dict = chunk[0]
-                media_title = item.get("title")
-                progress_queue.put((percent, f"Added {media_type}: {media_title} ({remaining_items}) items remaining"))
-            else:
-                progress_queue.put((percent, f"{len(chunk)} {media_type}s added ({remaining_items}) items remaining"))
+
+            # When updating, movies are inserted after those kept, episodes are appended
+            position = movie_position if media_type == "movie" else None
+
+            elapsed = add_chunk_with_progress(
+                media_type=media_type,
+                chunk=chunk,
+                playlist_id=playlist_id,
+                progress=progress,
+                percent=percent,
+                remaining_text=f"({remaining_items}) items remaining",
+                super_slow=super_slow,
+                position=position,
+            )
+
+            if position is not None:
+                movie_position += len(chunk)
+
+            if chunk_sizer is not None:
+                chunk_sizer.record(len(chunk), elapsed)
+
             if monitor.waitForAbort(0.0001):
                 break
 
-    progress_queue.put(("done", None))
+    if chunk_sizer is not None:
+        write_log("Adaptive chunk sizes used: %s", chunk_sizer.sizes, level=xbmc.LOGINFO)
+
+    progress.finish()
+    return True
+
+
+def playlist_builder_streaming(
+    media_queue: Queue,
+    monitor: xbmc.Monitor,
+    progress: ProgressReporter,
+    cancel_event: threading.Event,
+    clear_existing: bool = True,
+    playlist_id: int = 1,
+    chunk_size: int = 25,
+    deduplicate: bool = True,
+    chunk_sizer: AdaptiveChunkSize | None = None,
+) -> bool:
+    """Add media items to a given playlist in chunks as they arrive on the media queue, until None is received
+
+    Receiving gather_failed stops the build and returns False, as a cancelled build does.
+    Queue entries are (media type, items, share of sources gathered). Once the first chunk has been added,
+    it is reported as progress so playback can start while the build continues.
+    If deduplicate is set, items already received are dropped. A chunk_sizer replaces the fixed chunk_size.
+    """
+    if clear_existing:
+        write_log(f"Clearing playlist {playlist_id}")
+        clear_playlist(playlist_id=playlist_id)
+
+    pending: dict[str, MediaItems] = {"movie": MediaItems(), "episode": MediaItems()}
+    seen_ids: dict[str, set[int]] = {"movie": set(), "episode": set()}
+    duplicates_removed = 0
+    items_received = 0
+    items_completed = 0
+    gathered = 0.0
+    finished = False
+    first_chunk_added = False
+
+    media_type: Literal["movie", "episode"]
+
+    while not finished:
+        if cancel_event.is_set() or monitor.abortRequested():
+            return False
+
+        try:
+            entry = media_queue.get(timeout=0.1)
+        except Empty:
+            continue
+
+        if entry == gather_failed:
+            write_log("Gathering failed, stopping the build", level=xbmc.LOGERROR)
+            return False
+
+        if entry is None:
+            finished = True
+        else:
+            media_type, items, gathered = entry
+
+            if deduplicate:
+                unique = unseen_items(items, seen_ids[media_type])
+                duplicates_removed += len(items) - len(unique)
+                items = unique
+
+            # Copied into a new array, the pending items may be a view of chunks still being added
+            ids = array("i", pending[media_type].ids)
+            ids.extend(items.ids)
+            pending[media_type].titles.update(items.titles)
+            pending[media_type] = MediaItems(ids, pending[media_type].titles)
+            items_received += len(items)
+
+        for media_type, items in pending.items():
+            # Hold partial chunks back until gathering is complete
+            while len(items) >= (size := chunk_sizer.size if chunk_sizer else chunk_size) or (finished and items):
+                if cancel_event.is_set():
+                    return False
+
+                chunk, pending[media_type] = items[:size], items[size:]
+                items = pending[media_type]
+
+                items_completed += len(chunk)
+                # Scale by the share of sources gathered so far, the final total is unknown until then
+                percent = int(items_completed / items_received * (100 if finished else gathered * 100))
+
+                elapsed = add_chunk_with_progress(
+                    media_type=media_type,
+                    chunk=chunk,
+                    playlist_id=playlist_id,
+                    progress=progress,
+                    percent=percent,
+                    remaining_text=f"({items_received - items_completed}) gathered items remaining",
+                    super_slow=size == 1,
+                )
+
+                if chunk_sizer is not None:
+                    chunk_sizer.record(len(chunk), elapsed)
+
+                if not first_chunk_added:
+                    first_chunk_added = True
+                    progress.first_chunk_added()
+
+                if monitor.waitForAbort(0.0001):
+                    return False
+
+    write_log(f"Streamed {items_completed} items to playlist {playlist_id}")
+
+    if chunk_sizer is not None:
+        write_log("Adaptive chunk sizes used: %s", chunk_sizer.sizes, level=xbmc.LOGINFO)
+
+    if deduplicate:
+        write_log(f"Removed {duplicates_removed} duplicate items", level=xbmc.LOGINFO)
+
+    progress.finish()
     return True
 
 
@@ -0,0 +1,108 @@
+import xbmc
+import hashlib
+import threading
+import traceback
+import xbmcaddon
+
+from resources.lib.cache import (
+    discard_snapshot,
+    file_hash,
+    library_revisions,
+    read_snapshot,
+    stored_snapshot_stamp,
+    write_snapshot,
+)
+from resources.lib.config import config_file_path, open_config_file
+from resources.lib.logger import write_log
+from resources.lib.media import MediaItems
+from resources.lib.playlist_functions import deduplicate_media, playlist_gatherers
+
+# Settings that change which items a build selects
+selection_settings = (
+    "playlist_type",
+    "number_of_movies",
+    "default_number_of_episodes",
+    "exact_sampling",
+    "remove_duplicates",
+)
+
+snapshot_name = "next_selection"
+
+
+def selection_stamp() -> str:
+    """Return the config hash and library revisions a selection built now depends on, as a single key
+
+    The hash also covers the selection settings and, for smart playlists, the content of every configured .xsp file.
+    """
+    addon = xbmcaddon.Addon()
+
+    inputs = [file_hash(config_file_path())] + [addon.getSetting(name) for name in selection_settings]
+
+    if addon.getSetting("playlist_type") == "1":
+        inputs += [file_hash(playlist.get("path")) for playlist in open_config_file().get("smart", [])]
+
+    config_hash = hashlib.sha1(":".join(inputs).encode("utf-8")).hexdigest()
+    revisions = library_revisions()
+
+    return f"{config_hash}:{revisions.get('library', 0)}:{revisions.get('content', 0)}"
+
+
+def precomputed_selection_ready() -> bool:
+    """Return whether a stored selection still matches the config and library
+
+    Checked on disk, the build script consumes the selection in its own process and only deletes the file.
+    """
+    return stored_snapshot_stamp(snapshot_name) == selection_stamp()
+
+
+def precompute_selection(monitor: xbmc.Monitor, cancel_event: threading.Event | None = None) -> bool:
+    """Gather the next playlist's media and store it as id and title rows per media type, return whether it was stored"""
+    addon = xbmcaddon.Addon()
+    playlist_type = int(addon.getSetting("playlist_type"))
+
+    if playlist_type not in playlist_gatherers:
+        write_log(f"Playlist type undefined: {playlist_type}")
+        return False
+
+    # Taken before gathering, so a change while gathering leaves the stored selection stale
+    stamp = selection_stamp()
+
+    media_info = playlist_gatherers[playlist_type](monitor=monitor, cancel_event=cancel_event)
+
+    if monitor.abortRequested() or (cancel_event is not None and cancel_event.is_set()):
+        return False
+
+    if addon.getSettingBool("remove_duplicates"):
+        media_info, _ = deduplicate_media(media_info)
+
+    compact = {media_type: items.to_rows() for media_type, items in media_info.items()}
+    write_snapshot(snapshot_name, stamp, compact)
+
+    write_log(f"Precomputed next selection: {', '.join(f'{len(items)} {key}s' for key, items in media_info.items())}")
+    return True
+
+
+def take_precomputed_selection() -> dict[str, MediaItems] | None:
+    """Return the stored selection if it still matches the config and library, it is used only once"""
+    compact: dict[str, dict[str, list]] | None = read_snapshot(snapshot_name, selection_stamp())
+
+    discard_snapshot(snapshot_name)
+
+    if compact is None:
+        return None
+
+    return {media_type: MediaItems.from_rows(rows) for media_type, rows in compact.items()}
+
+
+def refresh_precomputed_selection(monitor: xbmc.Monitor, cancel_event: threading.Event | None = None) -> None:
+    """Precompute the next selection unless the stored one still matches, run on the service's background thread
+
+    Errors are logged, an unreadable config or playlist file must not stop the service.
+    """
+    try:
+        if not precomputed_selection_ready():
+            precompute_selection(monitor, cancel_event)
+
+    except Exception as e:
+        write_log(f"Exception while precomputing the next selection: {e}", level=xbmc.LOGERROR)
+        write_log(traceback.format_exc(), level=xbmc.LOGERROR)
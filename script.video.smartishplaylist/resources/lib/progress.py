@@ -0,0 +1,68 @@
+import time
+import threading
+from typing import NamedTuple
+
+
+class ProgressState(NamedTuple):
+    """Most recent build progress, version increases with every change
+
+    A NamedTuple rather than a frozen dataclass, dataclasses pulls in inspect and adds to every build's startup.
+    """
+    version: int = 0
+    percent: int = 0
+    text: str = ""
+    first_chunk: bool = False
+    finished: bool = False
+    completed: bool = False
+
+
+class ProgressReporter:
+    """Build progress shared between the worker thread and the progress dialog
+
+    Only the latest state is kept, so memory and dialog updates stay constant however many chunks are added.
+    Percent updates wake the dialog at most once per min_interval, first chunk and finish wake it immediately.
+    """
+
+    def __init__(self, min_interval: float = 0.1) -> None:
+        self.min_interval = min_interval
+        self._state = ProgressState()
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self._last_signal = 0.0
+
+    def _set(self, urgent: bool, **changes) -> None:
+        with self._lock:
+            if self._state.finished:
+                return
+
+            self._state = self._state._replace(version=self._state.version + 1, **changes)
+
+            now = time.monotonic()
+            if urgent or now - self._last_signal >= self.min_interval:
+                self._last_signal = now
+                self._changed.set()
+
+    def update(self, percent: int, text: str) -> None:
+        """Record the current percent and message"""
+        self._set(False, percent=percent, text=text)
+
+    def first_chunk_added(self) -> None:
+        """Record that the playlist has items, so playback may start"""
+        self._set(True, first_chunk=True)
+
+    def finish(self, completed: bool = True) -> None:
+        """Record the end of the build, only the first call counts"""
+        self._set(True, finished=True, completed=completed)
+
+    def wait(self, timeout: float) -> ProgressState:
+        """Wait until signalled or timeout seconds have passed, then return the latest state"""
+        self._changed.wait(timeout)
+        self._changed.clear()
+
+        with self._lock:
+            return self._state
+
+    @property
+    def state(self) -> ProgressState:
+        with self._lock:
+            return self._state
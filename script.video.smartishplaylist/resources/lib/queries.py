@@ -1,27 +1,54 @@
 import xbmc
 import time
 import json
+import threading
 import traceback
-from typing import Any
+from collections import Counter, namedtuple
+from typing import Any, Callable, Literal
 
 from resources.lib.logger import write_log
+from resources.lib.metrics import record_rpc
+from resources.lib.cache import Uncached, cached_snapshot, cached_mapping, library_revision
 
+# Maximum number of requests sent in a single JSON-RPC batch
+rpc_batch_size = 50
 
-def kodi_rpc(params: dict, return_result: bool = True) -> Any | None:
-    """Return a JSON object from rpc call"""
+# Library item type: JSON-RPC method listing every item of that type and the result key holding them
+library_methods: dict[str, tuple[str, str]] = {
+    "movie": ("VideoLibrary.GetMovies", "movies"),
+    "tvshow": ("VideoLibrary.GetTVShows", "tvshows"),
+    "episode": ("VideoLibrary.GetEpisodes", "episodes"),
+}
+
+# (item type, fields): named tuple type of that item type's records
+_record_types: dict[tuple[str, tuple[str, ...]], type] = {}
+
+# library revision: showlink index, rebuilt only when the movie snapshot changes
+_showlink_indexes: dict[int, dict[str, list[tuple]]] = {}
+_showlink_lock = threading.Lock()
+
+
+def kodi_rpc(params: dict, return_result: bool = True, object_hook: Callable[[dict], Any] | None = None) -> Any | None:
+    """Return a JSON object from rpc call, decoded with an optional json object_hook"""
     method: str = params.get("method", "UNKNOWN")
-    start = time.time()
 
     try:
-        response: str = xbmc.executeJSONRPC(json.dumps(params))
-        elapsed = time.time() - start
+        start = time.perf_counter()
+        request: str = json.dumps(params)
+        encoded = time.perf_counter()
+
+        response: str = xbmc.executeJSONRPC(request)
+        elapsed = time.perf_counter() - encoded
 
         write_log(f"RPC {method} took {elapsed:.3f}s")
 
         if not return_result:
+            record_rpc(method, elapsed, len(request), len(response), encoded - start, 0.0)
             return None
 
-        data: dict = json.loads(response)
+        decode_start = time.perf_counter()
+        data: dict = json.loads(response, object_hook=object_hook)
+        record_rpc(method, elapsed, len(request), len(response), encoded - start, time.perf_counter() - decode_start)
 
         if "error" in data:
             write_log(f"RPC ERROR in {method}: {data['error']}", level=xbmc.LOGERROR)
@@ -34,88 +61,334 @@ def kodi_rpc(params: dict, return_result: bool = True) -> Any | None:
         return None
 
 
-def list_all_movies() -> list[dict]:
-    """Return a list of all movies with their various attributes"""
-    write_log(message="Querying all Movies")
+def result_size(data: dict | None) -> int:
+    """Return the number of items in a response's result, 0 for scalar results"""
+    result = data.get("result") if data else None
 
-    movies_payload: dict = {
-        "jsonrpc": "2.0",
-        "method": "VideoLibrary.GetMovies",
-        "params": {"properties": ["title", "showlink"]},
-        "id": 1,
-    }
+    if isinstance(result, dict):
+        for value in result.values():
+            if isinstance(value, list):
+                return len(value)
 
-    movies_list: list[dict] = (
-        kodi_rpc(movies_payload, return_result=True).get("result", {}).get("movies", [])
-    )
+    return len(result) if isinstance(result, list) else 0
+
+
+def send_rpc_batch(payloads: list[dict], object_hook: Callable[[dict], Any] | None = None) -> list[dict | None]:
+    """Send payloads as one JSON-RPC batch, return responses in payload order, None where a call got no response"""
+    # Number requests by position so responses can be matched regardless of caller ids
+    batch: list[dict] = [{**payload, "id": index} for index, payload in enumerate(payloads)]
+    methods = Counter(payload.get("method", "UNKNOWN") for payload in batch)
+    methods_text = ", ".join(f"{method} x{count}" for method, count in methods.items())
+
+    try:
+        start = time.perf_counter()
+        request: str = json.dumps(batch)
+        encoded = time.perf_counter()
+
+        response: str = xbmc.executeJSONRPC(request)
+        elapsed = time.perf_counter() - encoded
+
+        decode_start = time.perf_counter()
+        data: list[dict] | dict = json.loads(response, object_hook=object_hook)
+
+        record_rpc(
+            f"batch of {', '.join(sorted(methods))}",
+            elapsed,
+            len(request),
+            len(response),
+            encoded - start,
+            time.perf_counter() - decode_start,
+            requests=len(batch),
+        )
 
-    write_log(f"All Movies info: {movies_list}")
+    except Exception as e:
+        write_log(f"Exception in RPC batch ({methods_text}): {e}", level=xbmc.LOGERROR)
+        write_log(traceback.format_exc(), level=xbmc.LOGERROR)
+        return [None] * len(payloads)
 
-    return movies_list
+    # A malformed batch is rejected as a whole with a single error object
+    if isinstance(data, dict):
+        write_log(f"RPC ERROR in batch ({methods_text}): {data.get('error')}", level=xbmc.LOGERROR)
+        return [None] * len(payloads)
 
+    responses_by_id: dict[int, dict] = {item.get("id"): item for item in data}
+    responses: list[dict | None] = []
 
-def list_of_all_tv_shows() -> list[dict]:
-    """Return a list of all TV shows with their various attributes"""
-    write_log("Querying all TV Shows")
+    for index, payload in enumerate(batch):
+        item = responses_by_id.get(index)
+        method = payload.get("method", "UNKNOWN")
 
-    tv_shows_payload: dict = {
-        "jsonrpc": "2.0",
-        "method": "VideoLibrary.GetTVShows",
-        "id": 1,
-        "params": {
-            "properties": [
-                "title",
-            ]
-        },
-    }
+        if item is None:
+            write_log(f"RPC batch returned no response for {method} (request {index})", level=xbmc.LOGERROR)
+        elif "error" in item:
+            write_log(f"RPC ERROR in {method} (request {index}): {item['error']}", level=xbmc.LOGERROR)
+
+        responses.append(item)
 
-    tv_show_list: list[dict] = (
-        kodi_rpc(tv_shows_payload).get("result", {}).get("tvshows", [])
+    write_log(
+        "RPC batch of %d (%s) took %.3fs, items per call: %s",
+        len(batch), methods_text, elapsed, [result_size(item) for item in responses]
     )
 
-    write_log(f"TV Shows info: {tv_show_list}")
+    return responses
 
-    return tv_show_list
 
+def kodi_rpc_batch(payloads: list[dict], object_hook: Callable[[dict], Any] | None = None) -> list[dict | None]:
+    """Return a response for each payload, sent in batches of rpc_batch_size, None where a call failed outright"""
+    responses: list[dict | None] = []
 
-def list_of_episodes_by_show_id(show_id: int, number: int | None = None) -> list[dict]:
-    """Return a list of episodes for a given show id and various episode attributes"""
-    write_log(f"Querying all episodes for show_id: {show_id}")
+    for start in range(0, len(payloads), rpc_batch_size):
+        responses += send_rpc_batch(payloads[start:start + rpc_batch_size], object_hook)
+
+    return responses
+
+
+def record_type(media_type: Literal["movie", "tvshow", "episode"], fields: tuple[str, ...]) -> type:
+    """Return the named tuple type of records holding a library item's id and the given fields"""
+    key = (media_type, fields)
 
-    episodes_payload: dict = {
+    if key not in _record_types:
+        _record_types[key] = namedtuple(f"{media_type.capitalize()}Record", ("id",) + fields)
+
+    return _record_types[key]
+
+
+def record_hook(media_type: Literal["movie", "tvshow", "episode"], fields: tuple[str, ...]) -> Callable[[dict], Any]:
+    """Return a json object_hook turning each library item into a record as soon as it is decoded
+
+    Only the record is kept, so the full item dicts of a large response never exist at the same time.
+    """
+    record = record_type(media_type, fields)
+    id_key = f"{media_type}id"
+
+    def hook(item: dict) -> Any:
+        if id_key not in item:
+            return item
+
+        return record(item[id_key], *[item.get(field) for field in fields])
+
+    return hook
+
+
+def library_payload(media_type: Literal["movie", "tvshow", "episode"], fields: tuple[str, ...], **params: Any) -> dict:
+    """Return a request listing library items of a type with only the properties needed for the given fields"""
+    return {
         "jsonrpc": "2.0",
-        "method": "VideoLibrary.GetEpisodes",
+        "method": library_methods[media_type][0],
         "id": 1,
-        "params": {
-            "tvshowid": show_id,
-            "properties": [
-                "title",
-            ],
-        },
+        "params": {**params, "properties": list(fields)},
     }
 
+
+def list_library_records(
+    media_type: Literal["movie", "tvshow"], fields: tuple[str, ...], use_cache: bool = True
+) -> list[tuple]:
+    """Return a record of the given fields for every movie or TV show, from the library snapshot of those fields where possible"""
+    if use_cache:
+        record = record_type(media_type, fields)
+
+        def load() -> list[tuple] | Uncached:
+            records = query_library_records(media_type, fields)
+            # A failed request is not stored, otherwise the library would look empty until the next scan
+            return Uncached([]) if records is None else records
+
+        return cached_snapshot(
+            f"{media_type}s_{'_'.join(fields)}",
+            load,
+            decode=lambda rows: [record(*row) for row in rows],
+        )
+
+    return query_library_records(media_type, fields) or []
+
+
+def query_library_records(media_type: Literal["movie", "tvshow"], fields: tuple[str, ...]) -> list[tuple] | None:
+    """Return a record of the given fields for every movie or TV show from Kodi, None if the request failed"""
+    write_log(f"Querying all {media_type}s for {fields}")
+
+    response: dict | None = kodi_rpc(library_payload(media_type, fields), object_hook=record_hook(media_type, fields))
+
+    if not response or "result" not in response:
+        return None
+
+    records: list[tuple] = response["result"].get(library_methods[media_type][1], [])
+
+    write_log("All %s records: %s", media_type, records)
+
+    return records
+
+
+def list_all_movies(fields: tuple[str, ...] = ("title",), use_cache: bool = True) -> list[tuple]:
+    """Return a record of the given fields for every movie, from the library snapshot where possible"""
+    return list_library_records("movie", fields, use_cache)
+
+
+def list_of_all_tv_shows(fields: tuple[str, ...] = ("title",), use_cache: bool = True) -> list[tuple]:
+    """Return a record of the given fields for every TV show, from the library snapshot where possible"""
+    return list_library_records("tvshow", fields, use_cache)
+
+
+def episodes_payload(show_id: int, number: int | None = None, fields: tuple[str, ...] = ("title",)) -> dict:
+    """Return a GetEpisodes request for a given show id, limited to a random number of episodes if provided"""
+    payload: dict = library_payload("episode", fields, tvshowid=show_id)
+
     if number:
-        episodes_payload["params"]["sort"] = {"method": "random"}
-        episodes_payload["params"]["limits"] = {"start": 0, "end": number}
+        payload["params"]["sort"] = {"method": "random"}
+        payload["params"]["limits"] = {"start": 0, "end": number}
+
+    return payload
 
-    episodes_list: list[dict] = (
-        kodi_rpc(episodes_payload).get("result", {}).get("episodes", [])
+
+def list_of_episodes_by_show_id(show_id: int, number: int | None = None, fields: tuple[str, ...] = ("title",)) -> list[tuple]:
+    """Return a record of the given fields for each episode of a given show id"""
+    write_log(f"Querying all episodes for show_id: {show_id}")
+
+    episodes_list: list[tuple] = (
+        kodi_rpc(episodes_payload(show_id, number, fields), object_hook=record_hook("episode", fields))
+        .get("result", {})
+        .get("episodes", [])
     )
-    write_log(f"Episodes list: {episodes_list}")
+    write_log("Episodes list: %s", episodes_list)
 
     return episodes_list
 
 
-def find_linked_movies_by_show_title(title:str) -> list[dict]:
-    """Return list of movies whose 'showlink' contains a given title"""
-    all_movies = list_all_movies()
-    linked_movies = [movie for movie in all_movies if title in movie.get("showlink")]
+def list_of_episodes_by_show_ids(
+    show_ids: list[int], numbers: list[int | None] | None = None, fields: tuple[str, ...] = ("title",)
+) -> list[list[tuple]]:
+    """Return episode records for each show id using batched requests, empty for any show whose request failed"""
+    if numbers is None:
+        numbers = [None] * len(show_ids)
+
+    write_log(f"Querying episodes for {len(show_ids)} shows")
+
+    responses = kodi_rpc_batch(
+        [episodes_payload(show_id, number, fields) for show_id, number in zip(show_ids, numbers)],
+        object_hook=record_hook("episode", fields),
+    )
+
+    episodes_lists: list[list[tuple]] = [
+        (response or {}).get("result", {}).get("episodes", []) for response in responses
+    ]
+
+    return episodes_lists
+
+
+def list_of_episode_ids_by_show_ids(show_ids: list[int]) -> list[list[int]]:
+    """Return the ids of every episode for each show id, kept in the library snapshot so only new shows are queried"""
+
+    def fetch(keys: list[str]) -> dict[str, list[int]]:
+        write_log(f"Querying episode ids for {len(keys)} shows")
+        responses = kodi_rpc_batch(
+            [episodes_payload(int(key), fields=()) for key in keys], object_hook=record_hook("episode", ())
+        )
+
+        # Failed requests are left out so they are retried next time rather than cached as empty
+        return {
+            key: [episode.id for episode in response["result"].get("episodes", [])]
+            for key, response in zip(keys, responses)
+            if response and "result" in response
+        }
+
+    episode_ids: dict[str, list[int]] = cached_mapping(
+        "episode_ids", [str(show_id) for show_id in show_ids], fetch
+    )
+
+    return [episode_ids.get(str(show_id), []) for show_id in show_ids]
+
+
+def episode_counts_by_show_ids(show_ids: list[int]) -> list[int]:
+    """Return the number of episodes for each show id from the library's reported totals, without listing episodes"""
+    responses = kodi_rpc_batch(
+        [
+            {
+                "jsonrpc": "2.0",
+                "method": "VideoLibrary.GetEpisodes",
+                "id": 1,
+                "params": {"tvshowid": show_id, "properties": [], "limits": {"start": 0, "end": 1}},
+            }
+            for show_id in show_ids
+        ]
+    )
+
+    counts: list[int] = [
+        (response or {}).get("result", {}).get("limits", {}).get("total", 0) for response in responses
+    ]
+
+    return counts
+
+
+def episode_titles_by_ids(episode_ids: list[int]) -> dict[int, str]:
+    """Return a mapping of episode id to title, episodes no longer in the library are left out"""
+    responses = kodi_rpc_batch(
+        [
+            {
+                "jsonrpc": "2.0",
+                "method": "VideoLibrary.GetEpisodeDetails",
+                "id": 1,
+                "params": {"episodeid": episode_id, "properties": ["title"]},
+            }
+            for episode_id in episode_ids
+        ]
+    )
+
+    titles: dict[int, str] = {
+        episode_id: response["result"]["episodedetails"].get("title")
+        for episode_id, response in zip(episode_ids, responses)
+        if response and "result" in response
+    }
+
+    return titles
+
+
+def build_showlink_index(all_movies: list[tuple]) -> dict[str, list[tuple]]:
+    """Return a mapping of each linked show title to the movie records whose 'showlink' lists it"""
+    index: dict[str, list[tuple]] = {}
+
+    for movie in all_movies:
+        for show_title in movie.showlink or []:
+            index.setdefault(show_title, []).append(movie)
+
+    return index
+
+
+def showlink_index() -> dict[str, list[tuple]]:
+    """Return the showlink index for the current library revision, building it once per snapshot"""
+    revision = library_revision()
+
+    with _showlink_lock:
+        if revision not in _showlink_indexes:
+            _showlink_indexes.clear()
+            _showlink_indexes[revision] = build_showlink_index(list_all_movies(("title", "showlink")))
+            write_log(f"Built showlink index of {len(_showlink_indexes[revision])} shows for revision {revision}")
+
+        return _showlink_indexes[revision]
+
+
+def find_linked_movies_by_show_title(title:str) -> list[tuple]:
+    """Return records (id, title, showlink) of movies whose 'showlink' contains a given title"""
+    linked_movies = showlink_index().get(title, [])
 
     return linked_movies
 
 
-def single_smart_playlist_info(path:str) -> dict:
-    """Return media items from a single smart playlist"""
+def playlist_items(playlist_id: int = 1) -> list[dict]:
+    """Return the items currently in a playlist, in order, with only their id and type"""
+    items_payload = {
+        "jsonrpc": "2.0",
+        "method": "Playlist.GetItems",
+        "params": {"playlistid": playlist_id, "properties": []},
+        "id": 1,
+    }
+
+    items: list[dict] = kodi_rpc(items_payload).get("result", {}).get("items", [])
+
+    write_log("Playlist %s items: %s", playlist_id, items)
+
+    return items
+
+
+def single_smart_playlist_info(path:str, properties: list[str] | None = None) -> dict:
+    """Return media items from a single smart playlist, with any extra item properties requested"""
 
     items = {
         "jsonrpc": "2.0",
@@ -127,8 +400,11 @@ def single_smart_playlist_info(path:str) -> dict:
         }
     }
 
+    if properties:
+        items["params"]["properties"] = properties
+
     playlist_items = kodi_rpc(items)
 
-    write_log(f"items: {playlist_items}")
+    write_log("items: %s", playlist_items)
 
     return playlist_items
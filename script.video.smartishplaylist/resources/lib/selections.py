@@ -1,8 +1,8 @@
+import xbmc
 import xbmcgui
 import json
 import xbmcaddon
 import xbmcvfs
-import xml.etree.ElementTree as ET
 
 from typing import Literal
 
@@ -10,35 +10,28 @@ from resources.lib.queries import (
     list_of_all_tv_shows,
     list_all_movies,
     list_of_episodes_by_show_id,
-    single_smart_playlist_info
+    list_of_episode_ids_by_show_ids,
+    episode_counts_by_show_ids,
 )
-from resources.lib.playlist_functions import gather_single_smart_playlist_media
 from resources.lib.logger import write_log
-from resources.lib.config import open_config_file, write_to_config
+from resources.lib.cache import cached_file_metadata, library_revision
+from resources.lib.config import open_config_file, write_to_config, batched_config_writes, config_signature
 
 
-def title_by_id_number(
-    media_id: int, all_media_info: list[dict], media_type: Literal["movie", "tvshow"]
-) -> str:
-    """Search library based on media id number and return its string title"""
-    titles: list[str] = [
-        item.get("title")
-        for item in all_media_info
-        if item.get(f"{media_type}id") == media_id
-    ]
+def titles_by_id(all_media_info: list[tuple]) -> dict[int, str]:
+    """Return a mapping of media id number to title for every library record"""
+    return {media.id: media.title for media in all_media_info}
 
-    if len(titles) == 0:
-        write_log(
-            write_log(f"{media_type} id {media_id} returns zero titles: {titles}")
-        )
-        titles.append("Error no title")
 
-    elif len(titles) > 1:
-        write_log(
-            f"{media_type} id {media_id} returns multiple titles: {titles}, selecting first entry"
-        )
+def title_by_id_number(
+    media_id: int, media_titles_by_id: dict[int, str], media_type: Literal["movie", "tvshow"]
+) -> str:
+    """Look up a media id number in a titles_by_id mapping and return its string title"""
+    title: str | None = media_titles_by_id.get(media_id)
 
-    title: str = titles[0]
+    if title is None:
+        write_log(f"{media_type} id {media_id} returns zero titles")
+        title = "Error no title"
 
     return title
 
@@ -46,48 +39,48 @@ def title_by_id_number(
 def media_titles_with_preselection_idx(
     retrieved_info: list[dict],
     media_type: Literal["movie", "tvshow"],
-    all_media_info: list[dict],
-) -> tuple[list[str], list[int]]:
-    """Return a tuple containing a list of sorted media titles and a list of preselection idx values determined by info retrieved from settings"""
+    all_media_info: list[tuple],
+) -> tuple[list[str], list[int], list[int]]:
+    """Return a tuple containing a list of sorted media titles, a list of preselection idx values determined by info retrieved from settings, and the media id at each title's position"""
 
-    id_title_pairs: dict[int, str] = {
-        media.get(f"{media_type}id"): media.get("title") for media in all_media_info
-    }
-    write_log(f"{media_type} title_id_pairs: {id_title_pairs}")
+    # Sort by title then id so duplicate titles keep a stable order and are told apart by id
+    id_title_pairs: list[tuple[str, int]] = sorted(
+        (media.title, media.id) for media in all_media_info
+    )
+    write_log("%s title_id_pairs: %s", media_type, id_title_pairs)
 
-    media_titles: list[str] = sorted(id_title_pairs.values())
-    write_log(f"{media_type} titles: {media_titles}")
+    media_titles: list[str] = [title for title, _ in id_title_pairs]
+    media_ids: list[int] = [media_id for _, media_id in id_title_pairs]
 
-    preselected_titles: list[str] = [item.get("title") for item in retrieved_info]
-    write_log(f"Pre-selected {media_type} titles: {preselected_titles}")
+    idx_by_id: dict[int, int] = {media_id: index for index, media_id in enumerate(media_ids)}
+
+    preselected_ids: list[int] = [item.get("id") for item in retrieved_info]
+    write_log("Pre-selected %s ids: %s", media_type, preselected_ids)
 
     preselected_idx: list[int] = [
-        media_titles.index(title) for title in preselected_titles
+        idx_by_id[media_id] for media_id in preselected_ids if media_id in idx_by_id
     ]
-    write_log(f"Pre-selected {media_type} idx: {preselected_idx}")
-
-    return media_titles, preselected_idx
+    write_log("Pre-selected %s idx: %s", media_type, preselected_idx)
 
+    if len(preselected_idx) < len(preselected_ids):
+        write_log(f"{len(preselected_ids) - len(preselected_idx)} pre-selected {media_type} ids are no longer in the library")
 
-def reconcile_titles(media_type:Literal["movie", "tvshow"], retrieved_info:list[dict], all_media_info:list[dict], selected_titles: list[str]) -> list[dict]:
-    """Reconcile existing selections with newly selected titles, implemented to preserve existing TV Show configs"""
+    return media_titles, preselected_idx, media_ids
 
-    selected_ids_titles: list[dict[str, str | int]] = [
-        {"id": item.get(f"{media_type}id"), "title": item.get("title")}
-        for item in all_media_info
-        if item.get("title") in selected_titles
-    ]
 
-    write_log(f"Selected {media_type} ids: {selected_ids_titles}")
+def reconcile_selections(retrieved_info:list[dict], selected_ids: list[int], media_titles_by_id: dict[int, str]) -> list[dict]:
+    """Reconcile existing selections with newly selected ids, implemented to preserve existing TV Show configs"""
 
-    existing_ids: list[int] = [item.get("id") for item in retrieved_info]
-    new_ids: list[int] = [item.get("id") for item in selected_ids_titles]
+    selected: set[int] = set(selected_ids)
+    existing_ids: set[int] = {item.get("id") for item in retrieved_info}
 
     retained_items: list[dict] = [
-        item for item in retrieved_info if item.get("id") in new_ids
+        item for item in retrieved_info if item.get("id") in selected
     ]
     new_items: list[dict] = [
-        item for item in selected_ids_titles if item.get("id") not in existing_ids
+        {"id": media_id, "title": media_titles_by_id.get(media_id)}
+        for media_id in selected_ids
+        if media_id not in existing_ids
     ]
 
     updated_selections:list[dict] = retained_items + new_items
@@ -99,11 +92,11 @@ def select_media(media_type: Literal["movie", "tvshow"]) -> None:
     """Allow user to select titles from a window and save those selections to settings, check for previously select titles"""
 
     if media_type == "movie":
-        all_media_info: list[dict] = list_all_movies()
+        all_media_info: list[tuple] = list_all_movies(("title",))
         selection_text: str = "Select Movies"
 
     elif media_type == "tvshow":
-        all_media_info: list[dict] = list_of_all_tv_shows()
+        all_media_info: list[tuple] = list_of_all_tv_shows(("title",))
         selection_text: str = "Select TV Shows"
 
     else:
@@ -115,7 +108,8 @@ def select_media(media_type: Literal["movie", "tvshow"]) -> None:
 
     titles: list[str]
     preselected_idx: list[int]
-    titles, preselected_idx = media_titles_with_preselection_idx(
+    media_ids: list[int]
+    titles, preselected_idx, media_ids = media_titles_with_preselection_idx(
         retrieved_info=retrieved_info,
         media_type=media_type,
         all_media_info=all_media_info,
@@ -126,14 +120,13 @@ def select_media(media_type: Literal["movie", "tvshow"]) -> None:
     )
 
     if choices:
-        selected_titles: list[str] = [titles[index] for index in choices]
-        write_log(f"Selected {media_type} titles: {selected_titles}")
+        selected_ids: list[int] = [media_ids[index] for index in choices]
+        write_log("Selected %s ids: %s", media_type, selected_ids)
 
-        updated_selections = reconcile_titles(
-            media_type=media_type,
+        updated_selections = reconcile_selections(
             retrieved_info=retrieved_info,
-            all_media_info=all_media_info,
-            selected_titles=selected_titles
+            selected_ids=selected_ids,
+            media_titles_by_id=titles_by_id(all_media_info),
         )
 
         config_file[media_type] = updated_selections
@@ -151,7 +144,7 @@ def obtain_show_config(
     possible_settings: list[dict] = [
         item for item in shows_config if item.get("id") == tv_show_id
     ]
-    write_log(f"{tv_show_title} settings: {possible_settings}")
+    write_log("%s settings: %s", tv_show_title, possible_settings)
 
     if len(possible_settings) > 0:
         selected_show_settings: dict[str, str | int | list] = possible_settings[0]
@@ -168,7 +161,7 @@ def obtain_show_config(
     excluded_episodes: list[dict[str, str | int]] = selected_show_settings.get(
         "exclusions", []
     )
-    write_log(f"Exclusions: {excluded_episodes}")
+    write_log("Exclusions: %s", excluded_episodes)
 
     return number_of_episodes, excluded_episodes
 
@@ -194,14 +187,15 @@ def define_exclusions(
     excluded_episodes: list[dict],
 ) -> list[dict]:
     """Return of list of dictionaries containing id/title for episodes to be excluded, preselect if applicable"""
-    selected_show_episodes: list[dict] = list_of_episodes_by_show_id(tv_show_id)
-    episode_titles: list[str] = sorted(
-        [episode.get("title") for episode in selected_show_episodes]
+    selected_show_episodes: list[tuple] = list_of_episodes_by_show_id(tv_show_id, fields=("title",))
+    episodes: list[tuple[str, int]] = sorted(
+        (episode.title, episode.id) for episode in selected_show_episodes
     )
+    episode_titles: list[str] = [title for title, _ in episodes]
 
-    preselected_titles: list[str] = [item.get("title") for item in excluded_episodes]
+    idx_by_id: dict[int, int] = {episode_id: index for index, (_, episode_id) in enumerate(episodes)}
     preselected_idx: list[int] = [
-        episode_titles.index(title) for title in preselected_titles
+        idx_by_id[item.get("id")] for item in excluded_episodes if item.get("id") in idx_by_id
     ]
 
     excluded_indexes: list[int] = window.multiselect(
@@ -213,11 +207,8 @@ def define_exclusions(
     if not excluded_indexes:
         excluded_indexes = []
 
-    excluded_titles: list[str] = [episode_titles[index] for index in excluded_indexes]
     excluded_episodes: list[dict] = [
-        {"id": episode.get("episodeid"), "title": episode.get("title")}
-        for episode in selected_show_episodes
-        if episode.get("title") in excluded_titles
+        {"id": episodes[index][1], "title": episodes[index][0]} for index in excluded_indexes
     ]
 
     return excluded_episodes
@@ -250,7 +241,7 @@ def update_shows_config(
 
     tv_shows_configurations.append(new_show_config)
 
-    write_log(f"Updated TV Shows configurations: {tv_shows_configurations}")
+    write_log("Updated TV Shows configurations: %s", tv_shows_configurations)
 
     config["tvshow"] = tv_shows_configurations
 
@@ -268,7 +259,7 @@ def configure_single_show(tv_show_id: int, tv_show_title: str) -> None:
         tv_shows_configurations: list[dict] = config.get("tvshow")
         default_number_of_episodes: int = json.loads(addon.getSetting("default_number_of_episodes"))
 
-        write_log(f"Retrieved all tv show settings: {tv_shows_configurations}")
+        write_log("Retrieved all tv show settings: %s", tv_shows_configurations)
 
         number_of_episodes: int
         excluded_episodes: list[dict]
@@ -345,9 +336,10 @@ def configure_shows() -> None:
 
         tv_show_selections: list[dict] = config.get("tvshow")
 
-        write_log(f"Selected TV Shows: {tv_show_selections}")
+        write_log("Selected TV Shows: %s", tv_show_selections)
 
-        titles: list[str] = sorted([item.get("title") for item in tv_show_selections])
+        shows: list[tuple[str, int]] = sorted((item.get("title"), item.get("id")) for item in tv_show_selections)
+        titles: list[str] = [title for title, _ in shows]
 
         choice: int = window.select(
             "Select TV Show for additional configuration", list=titles
@@ -358,36 +350,54 @@ def configure_shows() -> None:
             break
 
         elif choice != -1:
-            title: str = titles[choice]
-            tv_show_id: int = [
-                show.get("id")
-                for show in tv_show_selections
-                if show.get("title") == title
-            ][0]
-            configure_single_show(tv_show_id=int(tv_show_id), tv_show_title=title)
+            title, tv_show_id = shows[choice]
+            # Save this show's edits once, when its menu is closed
+            with batched_config_writes():
+                configure_single_show(tv_show_id=int(tv_show_id), tv_show_title=title)
+
+
+def smart_playlist_name(filepath: str) -> str | None:
+    """Return the <name> of a smart playlist file, reading only as far as that element"""
+    # Only needed when a changed playlist file is read, not by every selections dialog
+    import xml.etree.ElementTree as ET
+
+    parser = ET.XMLPullParser(events=("end",))
+
+    with xbmcvfs.File(filepath) as file:
+        while True:
+            data: bytearray = file.readBytes(4096)
+            if not data:
+                break
+
+            try:
+                parser.feed(bytes(data))
+                for _, element in parser.read_events():
+                    if element.tag == "name":
+                        return element.text
+            except ET.ParseError as e:
+                write_log(f"Unable to read smart playlist {filepath}: {e}", level=xbmc.LOGWARNING)
+                return None
+
+    write_log(f"Smart playlist {filepath} has no name", level=xbmc.LOGWARNING)
+    return None
 
 
 def list_smart_playlists() -> list[dict[str, str]]:
-    """Return a list of smart playlist dictionaries, name, path keys """
-    smart_playlists = []
+    """Return a list of smart playlist dictionaries, name, path keys, names are only re-read from changed files"""
+    filepaths = []
     paths = ["special://profile/playlists/video/", "special://xbmc/system/playlists/video/"]
 
     for path in paths:
         dirs, files = xbmcvfs.listdir(path)
-        playlists = [f for f in files if f.endswith(".xsp")]
-        for playlist in playlists:
-            filepath = path + playlist
-
-            file = xbmcvfs.File(filepath)
-            xml_data = file.read()
-            file.close()
+        filepaths += [path + f for f in files if f.endswith(".xsp")]
 
-            root = ET.fromstring(xml_data)
-            title = root.findtext("name")
+    titles: dict[str, str | None] = cached_file_metadata("smart_playlist_names", filepaths, smart_playlist_name)
 
-            smart_playlists.append({"title": title, "path": filepath})
+    smart_playlists = [
+        {"title": title, "path": filepath} for filepath, title in titles.items() if title is not None
+    ]
 
-    write_log(f"Smart Playlists: {smart_playlists}")
+    write_log("Smart Playlists: %s", smart_playlists)
 
     return smart_playlists
 
@@ -397,22 +407,21 @@ def select_smart_playlists() -> None:
     config: dict[str, list] = open_config_file()
 
     preselected_smart_playlists: list[dict[str,str]] = config.get("smart", [])
-    preselected_titles:list[str] = [playlist.get("title") for playlist in preselected_smart_playlists]
+    preselected_paths:set[str] = {playlist.get("path") for playlist in preselected_smart_playlists}
 
-    playlists:list[dict[str,str]] = list_smart_playlists()
+    playlists:list[dict[str,str]] = sorted(list_smart_playlists(), key=lambda playlist: (playlist.get("title"), playlist.get("path")))
 
-    available_titles:list[str] = sorted([playlist.get("title") for playlist in playlists])
+    available_titles:list[str] = [playlist.get("title") for playlist in playlists]
 
-    preselected_idx:list[int] = [available_titles.index(title) for title in preselected_titles if title in available_titles]
+    preselected_idx:list[int] = [index for index, playlist in enumerate(playlists) if playlist.get("path") in preselected_paths]
 
     choices: list[int] = xbmcgui.Dialog().multiselect(
         "Select Smart Playlists", available_titles, preselect=preselected_idx
     )
 
     if choices:
-        selected_titles: list[str] = [available_titles[index] for index in choices]
-        latest_playlist_selection: list[dict[str,str]] = [playlist for playlist in playlists if playlist.get("title") in selected_titles]
-        write_log(f"Latest smart playlist selection: {latest_playlist_selection}")
+        latest_playlist_selection: list[dict[str,str]] = [playlists[index] for index in choices]
+        write_log("Latest smart playlist selection: %s", latest_playlist_selection)
         config["smart"] = latest_playlist_selection
         write_to_config(config)
 
@@ -421,6 +430,14 @@ def review_manual_tv_show_selections(tv_show_config:list, default_number_of_epis
     """Calculate total number of expected episodes and produce user-friendly text for display"""
     total_number_of_episodes = 0
     shows_text = []
+
+    # Totals alone are enough unless exclusions have to be subtracted, then only episode ids are needed
+    counted_show_ids: list[int] = [show.get("id") for show in tv_show_config if not show.get("exclusions")]
+    excluding_show_ids: list[int] = [show.get("id") for show in tv_show_config if show.get("exclusions")]
+
+    episode_counts: dict[int, int] = dict(zip(counted_show_ids, episode_counts_by_show_ids(counted_show_ids)))
+    episode_ids: dict[int, list[int]] = dict(zip(excluding_show_ids, list_of_episode_ids_by_show_ids(excluding_show_ids)))
+
     # {"id": 101, "title": "show_title", "number_of_episodes": 10, "exclusions": [{"id": 1001, "title": "episode_title"}]}
     for show in tv_show_config:
         show_id:int = show.get("id")
@@ -429,12 +446,14 @@ def review_manual_tv_show_selections(tv_show_config:list, default_number_of_epis
         exclusions:list[dict] = show.get("exclusions", [])
 
         # Account for shows with fewer number of episodes than the user defined/default selection number
-        excluded_ids:list[int] = [episode.get("id") for episode in exclusions]
-        total_episodes:list[dict] = list_of_episodes_by_show_id(show_id)
-        eligible_episodes = [episode for episode in total_episodes if episode.get("episodeid") not in excluded_ids]
+        if exclusions:
+            excluded_ids:set[int] = {episode.get("id") for episode in exclusions}
+            eligible_episodes = sum(1 for episode_id in episode_ids.get(show_id, []) if episode_id not in excluded_ids)
+        else:
+            eligible_episodes = episode_counts.get(show_id, 0)
 
-        if number_of_episodes > len(eligible_episodes):
-            number_of_episodes = len(eligible_episodes)
+        if number_of_episodes > eligible_episodes:
+            number_of_episodes = eligible_episodes
 
         total_number_of_episodes += number_of_episodes
 
@@ -461,6 +480,9 @@ def review_selections() -> None:
     window = xbmcgui.Dialog()
     addon = xbmcaddon.Addon()
 
+    # Key the TV Show summary was computed for, it is reused until the config or library changes
+    summary_key: tuple | None = None
+
     while True:
         selections: dict[str, list] = open_config_file()
 
@@ -475,9 +497,13 @@ def review_selections() -> None:
         if number_of_movies >= len(movies):
             number_of_movies = len(movies)
 
-        total_episodes:int
-        shows_text:str
-        total_episodes, shows_text = review_manual_tv_show_selections(tv_shows, default_number_of_episodes)
+        key = (config_signature(), library_revision(), default_number_of_episodes)
+
+        if key != summary_key:
+            total_episodes:int
+            shows_text:str
+            total_episodes, shows_text = review_manual_tv_show_selections(tv_shows, default_number_of_episodes)
+            summary_key = key
 
         choices = [f"Movies ({number_of_movies})", f"TV Shows ({total_episodes})"]
 
@@ -516,6 +542,9 @@ def review_selections() -> None:
 
 def review_smart_playlist_selections() -> None:
     """Provide a user-friendly display for media selections defined in smart playlists"""
+    # Imported here so the other dialogs do not load the build pipeline
+    from resources.lib.playlist_functions import smart_playlist_counts
+
     window = xbmcgui.Dialog()
 
     total_episodes = 0
@@ -530,11 +559,7 @@ def review_smart_playlist_selections() -> None:
         title = playlist.get("title")
         path = playlist.get("path")
 
-        files = single_smart_playlist_info(path).get("result", {}).get("files", {})
-        playlist_episodes, playlist_movies = gather_single_smart_playlist_media(files)
-
-        playlist_counts["episodes"] = len(playlist_episodes)
-        playlist_counts["movies"] = len(playlist_movies)
+        playlist_counts["episodes"], playlist_counts["movies"] = smart_playlist_counts(path)
 
         total_movies += playlist_counts.get("movies")
         total_episodes += playlist_counts.get("episodes")
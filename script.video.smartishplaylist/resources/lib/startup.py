@@ -0,0 +1,82 @@
+import re
+import time
+import xbmc
+
+from resources.lib.logger import write_log
+
+# Average CPU usage, in percent, below which Kodi counts as idle for a deferred startup build
+startup_cpu_idle_percent = 50
+
+# Seconds the CPU has to stay below that before the build starts
+startup_idle_seconds = 3
+
+# Seconds after the home screen opens during which a library scan started by Kodi still defers the build
+startup_scan_grace_seconds = 5
+
+# Longest a deferred build waits after the home screen opens, so a device that never settles still gets its playlist
+startup_max_wait_seconds = 120
+
+
+def cpu_usage() -> float | None:
+    """Return the average CPU usage Kodi reports across cores, None if it reports none"""
+    values = [float(value) for value in re.findall(r"(\d+(?:\.\d+)?)%", xbmc.getInfoLabel("System.CpuUsage"))]
+
+    if not values:
+        return None
+
+    return sum(values) / len(values)
+
+
+class StartupTrigger:
+    """Decides when the build at startup runs, fed library scan notifications by the service's monitor
+
+    The build waits for the home screen. If deferred, it also waits for a library scan Kodi runs at startup to
+    finish and for the CPU to settle, so it does not compete with Kodi's own startup work.
+    Kodi sends no notification when the home screen opens, so that alone is checked on each service tick.
+    """
+
+    def __init__(self, defer: bool) -> None:
+        self.defer = defer
+        self.scanning: bool = xbmc.getCondVisibility("Library.IsScanningVideo")
+        self.home_since: float | None = None
+        self.idle_since: float | None = None
+
+    def on_notification(self, sender: str, method: str, data: str) -> None:
+        if method == "VideoLibrary.OnScanStarted":
+            self.scanning = True
+
+        elif method == "VideoLibrary.OnScanFinished":
+            self.scanning = False
+
+    def ready(self) -> bool:
+        """Return whether the build can start now"""
+        now = time.monotonic()
+
+        if self.home_since is None:
+            if not xbmc.getCondVisibility("Window.IsVisible(10000)"):
+                return False
+
+            self.home_since = now
+
+        if not self.defer:
+            return True
+
+        waited = now - self.home_since
+
+        if waited >= startup_max_wait_seconds:
+            write_log(f"Starting build after waiting {startup_max_wait_seconds}s, Kodi is still busy")
+            return True
+
+        if self.scanning or waited < startup_scan_grace_seconds:
+            return False
+
+        usage = cpu_usage()
+
+        if usage is not None and usage > startup_cpu_idle_percent:
+            self.idle_since = None
+            return False
+
+        if self.idle_since is None:
+            self.idle_since = now
+
+        return now - self.idle_since >= startup_idle_seconds
@@ -0,0 +1,84 @@
+import xbmc
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Any, Callable
+
+from resources.lib.logger import write_log
+
+
+def stop_requested(monitor: xbmc.Monitor, cancel_event: threading.Event | None, wait_seconds: float = 0) -> bool:
+    """Return True once Kodi is shutting down or the user has cancelled"""
+    if cancel_event is not None and cancel_event.is_set():
+        return True
+
+    return monitor.waitForAbort(wait_seconds) if wait_seconds else monitor.abortRequested()
+
+
+def ordered_map(
+    function: Callable[[Any], Any],
+    items: list,
+    monitor: xbmc.Monitor,
+    cancel_event: threading.Event | None = None,
+    max_workers: int = 1,
+    poll_interval: float = 0.01,
+    on_result: Callable[[int, Any], None] | None = None,
+) -> list:
+    """Return function(item) for each item in input order using up to max_workers threads, stop early on abort/cancel
+
+    When stopped early, only the leading run of completed results is returned, as a serial loop would have.
+    on_result(index, result) is called in input order as soon as each result and all those before it are ready.
+    """
+    results: list = []
+
+    if max_workers <= 1 or len(items) <= 1:
+        for index, item in enumerate(items):
+            results.append(function(item))
+
+            if on_result is not None:
+                on_result(index, results[-1])
+
+            if stop_requested(monitor, cancel_event, poll_interval):
+                break
+
+        return results
+
+    completed: dict[int, Any] = {}
+    pending: dict[Future, int] = {}
+    next_index = 0
+    next_result = 0
+    stopped = False
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    try:
+        while next_index < len(items) or pending:
+            # Keep at most max_workers calls in flight so cancelling never leaves a backlog behind
+            while next_index < len(items) and len(pending) < max_workers:
+                pending[executor.submit(function, items[next_index])] = next_index
+                next_index += 1
+
+            done, _ = wait(pending, timeout=poll_interval, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                completed[pending.pop(future)] = future.result()
+
+            while next_result in completed:
+                if on_result is not None:
+                    on_result(next_result, completed[next_result])
+                next_result += 1
+
+            if stop_requested(monitor, cancel_event):
+                write_log(f"Stopped after {len(completed)} of {len(items)} items")
+                stopped = True
+                break
+
+    finally:
+        # Do not wait on in-flight calls once stopped, their results are discarded anyway
+        executor.shutdown(wait=not stopped, cancel_futures=True)
+
+    for index in range(len(items)):
+        if index not in completed:
+            break
+        results.append(completed[index])
+
+    return results
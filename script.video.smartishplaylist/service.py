@@ -1,14 +1,60 @@
 import xbmc
+import time
+import threading
 import xbmcaddon
 
+from resources.lib.monitor import LibraryMonitor
+from resources.lib.startup import StartupTrigger
+
+# Seconds between checks whether the precomputed selection needs rebuilding
+precompute_check_interval = 60
+
+# Seconds without user input before the service precomputes the next selection
+precompute_idle_seconds = 60
+
 addon = xbmcaddon.Addon()
 
-if addon.getSettingBool("build_at_startup"):
-    monitor = xbmc.Monitor()
+monitor = LibraryMonitor()
+
+startup_build_pending = addon.getSettingBool("build_at_startup")
+
+startup_trigger = StartupTrigger(defer=addon.getSettingBool("defer_startup_build"))
+monitor.listeners.append(startup_trigger.on_notification)
 
-    while not monitor.waitForAbort(0.5):
-        if xbmc.getCondVisibility("Window.IsVisible(10000)"):
-            break
+precompute_thread: threading.Thread | None = None
+precompute_cancel = threading.Event()
+last_precompute_check = 0.0
 
-    if not monitor.abortRequested():
+# Stay resident so library notifications keep reaching the monitor
+while not monitor.waitForAbort(0.5 if startup_build_pending else 1):
+    monitor.flush_revisions()
+
+    if startup_build_pending and startup_trigger.ready():
+        startup_build_pending = False
+        monitor.listeners.remove(startup_trigger.on_notification)
         xbmc.executebuiltin("RunScript(script.video.smartishplaylist)")
+
+    # Precompute the next selection while Kodi sits idle, so the next build can skip gathering
+    if (
+        not startup_build_pending
+        and (precompute_thread is None or not precompute_thread.is_alive())
+        and time.monotonic() - last_precompute_check > precompute_check_interval
+    ):
+        # Restarted whatever the outcome, so the checks below run at most once per interval
+        last_precompute_check = time.monotonic()
+
+        if (
+            xbmc.getGlobalIdleTime() >= precompute_idle_seconds
+            and not xbmc.getCondVisibility("Player.HasMedia")
+            and xbmcaddon.Addon().getSettingBool("precompute_selection")
+        ):
+            # Imported only once enabled, it loads the build pipeline and would add to every Kodi startup
+            from resources.lib.precompute import refresh_precomputed_selection
+
+            # The readiness check reads the config and playlist files, so it runs on the thread too
+            precompute_thread = threading.Thread(
+                target=refresh_precomputed_selection, args=(monitor, precompute_cancel), daemon=True
+            )
+            precompute_thread.start()
+
+precompute_cancel.set()